@@ -2,46 +2,18 @@
 # Agam Grewal – Capstone Project
 # Evaluates the BLIP-VQA baseline model (without captions) and generates plots
 
+import os
+import sys
 import json
-import re
-import matplotlib.pyplot as plt
-from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from vqa.scoring import GroundTruth
+from vqa.annotations import load_annotation_store
+from vqa.figures import FigureJob, plot_accuracy_bars, render_figures
 
 # -----------------------------------------------------
 # Helper functions
 # -----------------------------------------------------
-def clean_text(text):
-    text = text.lower().strip()
-    text = re.sub(r"[^a-z0-9 ]+", "", text)
-    return text
-
-
-def get_baseline_accuracy(predictions, ground_truth):
-    correct, total = 0, 0
-    for pred in predictions:
-        qid = pred["question_id"]
-        total += 1
-        if clean_text(pred["answer"]) == ground_truth.get(qid, ""):
-            correct += 1
-    return (correct / total * 100) if total > 0 else 0
-
-
-def compute_accuracy_by_question_type(preds, gt, qdata):
-    grouped = defaultdict(lambda: {"correct": 0, "total": 0})
-    qtext = {q["question_id"]: q["question"].lower() for q in qdata}
-
-    for p in preds:
-        qid = p["question_id"]
-        question = qtext.get(qid, "")
-        prefix = question.split(" ")[0] if question else "other"
-        grouped[prefix]["total"] += 1
-        if clean_text(p["answer"]) == gt.get(qid, ""):
-            grouped[prefix]["correct"] += 1
-
-    acc_by_type = {k: (v["correct"] / v["total"]) * 100 for k, v in grouped.items() if v["total"] > 0}
-    return acc_by_type
-
-
 def show_baseline_results(summary):
     print("\n===== Baseline Model Evaluation =====")
     print(f"Questions evaluated: {summary['evaluated']}")
@@ -60,39 +32,30 @@ def run_baseline_check():
 
     with open(pred_path) as f:
         preds = json.load(f)
-    with open(annotation_path) as f:
-        data = json.load(f)["annotations"]
-    with open(question_path) as f:
-        qdata = json.load(f)["questions"]
 
-    gt = {a["question_id"]: clean_text(a["multiple_choice_answer"]) for a in data}
+    gt = GroundTruth.from_store(load_annotation_store(question_path, annotation_path))
+    scores = gt.score(preds)
 
-    accuracy = get_baseline_accuracy(preds, gt)
+    accuracy = scores.accuracy()
     summary = {
-        "evaluated": len(preds),
-        "correct": int(accuracy * len(preds) / 100),
+        "evaluated": len(scores),
+        "correct": int(scores.strict.sum()),
         "accuracy": round(accuracy, 2),
     }
     with open("results/baseline_accuracy_summary.json", "w") as f:
         json.dump(summary, f, indent=2)
 
     # --- Accuracy by question type
-    acc_by_type = compute_accuracy_by_question_type(preds, gt, qdata)
-    types, accs = zip(*sorted(acc_by_type.items(), key=lambda x: x[1], reverse=True))
-
-    plt.figure(figsize=(10, 5))
-    plt.bar(types, accs, color="#2980b9", width=0.6)
-    plt.title("Baseline BLIP-VQA Accuracy by Question Type", fontsize=14, fontweight="bold")
-    plt.ylabel("Accuracy (%)")
-    plt.xlabel("Question Type")
-    plt.xticks(rotation=40, ha="right")
-    plt.grid(axis="y", linestyle="--", alpha=0.7)
-    plt.tight_layout()
-    plt.savefig("results/baseline_accuracy_by_type.png", dpi=300)
-    plt.close()
+    # Re-rendered only when the per-type accuracies change.
+    acc_by_type = scores.by_group(gt.question_prefix)
+    render_figures([FigureJob(plot_accuracy_bars, "results/baseline_accuracy_by_type.png", {
+        "labels": list(acc_by_type), "values": [round(a, 4) for a in acc_by_type.values()],
+        "title": "Baseline BLIP-VQA Accuracy by Question Type", "color": "#2980b9", "figsize": [10, 5],
+        "title_bold": True, "rotation": 40, "grid": True, "sort": True,
+    })])
 
     show_baseline_results(summary)
-    print("Saved bar chart to results/baseline_accuracy_by_type.png")
+    print("Bar chart: results/baseline_accuracy_by_type.png")
 
 
 if __name__ == "__main__":
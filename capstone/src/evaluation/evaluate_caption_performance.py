@@ -1,69 +1,80 @@
 # ================== IMPORTS ==================
-import json, time, psutil, GPUtil, matplotlib.pyplot as plt
-from collections import Counter
+import os, sys, json, time, argparse, GPUtil
 from pathlib import Path
-from bert_score import score as bertscore
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from vqa.scoring import GroundTruth
+from vqa.bertscore import CachedBertScorer
+from vqa.figures import FigureJob, plot_accuracy_bars, plot_metrics_table, render_figures
+from vqa.annotations import load_annotation_store
 
 # ================== CONFIG ==================
-RUN_TYPE = "caption"
+# python src/evaluation/evaluate_caption_performance.py [--run baseline|caption]
+parser = argparse.ArgumentParser(description="Evaluate a run's predictions, BERTScore and system metrics.")
+parser.add_argument("--run", choices=["baseline", "caption"], default="caption",
+                    help="which results/<run>_predictions.json to evaluate")
+RUN_TYPE = parser.parse_args().run
 PRED_FILE = Path(f"results/{RUN_TYPE}_predictions.json")
+METRICS_FILE = Path(f"results/{RUN_TYPE}_metrics.json")
+BERTSCORE_FILE = Path(f"results/{RUN_TYPE}_bertscore.json")
+CAPTIONING_METRICS_FILE = Path("results/captioning_metrics.json")  # python -m src.vqa captions
+QUESTIONS_FILE = Path("src/data/annotations/vqa_train_sample5000_questions.json")
 ANNOTATIONS_FILE = Path("src/data/annotations/vqa_train_sample5000_annotations.json")
 OUT_DIR = Path("results")
 OUT_DIR.mkdir(exist_ok=True)
 
-# ================== HELPERS ==================
-def compute_vqa_soft_accuracy(pred, gt_answers):
-    pred = pred.strip().lower()
-    match_count = sum(pred == ans for ans in gt_answers)
-    return min(1.0, match_count / 3.0)
-
 # ================== LOAD DATA ==================
 start_time = time.time()
 with open(PRED_FILE, "r") as f:
     predictions = json.load(f)
-with open(ANNOTATIONS_FILE, "r") as f:
-    annotations = json.load(f)["annotations"]
-gt_map = {a["question_id"]: [ans["answer"].lower() for ans in a["answers"]] for a in annotations}
-qtype_map = {a["question_id"]: a.get("question_type", "Other") for a in annotations}
+store = load_annotation_store(str(QUESTIONS_FILE), str(ANNOTATIONS_FILE))
+gt = GroundTruth.from_store(store)
 
 # ================== EVALUATION ==================
-total = len(predictions)
-strict_correct = 0
-soft_sum = 0.0
-refs, hyps = [], []
-type_counter, correct_counter = Counter(), Counter()
-for p in predictions:
-    qid = p.get("question_id")
-    pred = p.get("answer", "").strip().lower()
-    gt_answers = gt_map.get(qid, [])
-    q_type = qtype_map.get(qid, "Other")
-    if any(pred == ans for ans in gt_answers):
-        strict_correct += 1
-        correct_counter[q_type] += 1
-    acc = compute_vqa_soft_accuracy(pred, gt_answers)
-    soft_sum += acc
-    type_counter[q_type] += 1
-    if gt_answers:
-        refs.append(gt_answers[0])
-        hyps.append(pred)
-    else:
-        refs.append("")
-        hyps.append(pred)
-strict_acc = (strict_correct / total) * 100 if total > 0 else 0
-soft_acc = (soft_sum / total) * 100 if total > 0 else 0
+scores = gt.score(predictions)
+total = len(scores)
+strict_acc = scores.accuracy("any_match")
+soft_acc = scores.accuracy("soft")
+acc_by_type = scores.by_group(gt.question_type, "any_match")
+hyps = [p.get("answer", "").strip().lower() for p in predictions]
+ref_rows = store.rows([p.get("question_id", -1) for p in predictions])
+refs = [((store.answers(row) or [""])[0] if row >= 0 else "").lower() for row in ref_rows]
 
 # ================== BERTSCORE ==================
-P, R, F1 = bertscore(hyps, refs, lang="en", rescale_with_baseline=True)
+# Embeddings and pair scores are cached under src/data/cache/bertscore across runs.
+P, R, F1 = CachedBertScorer(lang="en", rescale_with_baseline=True).score(hyps, refs)
 bert_mean = float(F1.mean() * 100)
+# Per-question F1, read by results.py for the BERTScore vs accuracy figure.
+with open(BERTSCORE_FILE, "w") as f:
+    json.dump({"question_id": [p.get("question_id", -1) for p in predictions],
+               "f1": [round(float(v), 6) for v in F1]}, f)
 
 # ================== SYSTEM METRICS ==================
-elapsed = time.time() - start_time
-avg_inference_time = (elapsed / total) if total > 0 else 0
-throughput = total / elapsed if elapsed > 0 else 0
+# Timings come from the inference run itself (python -m src.vqa run writes
+# <run>_metrics.json); timing this script would only measure JSON and BERTScore.
+eval_elapsed = time.time() - start_time
+avg_inference_time = throughput = p95_latency = cpu_util = 0
+if METRICS_FILE.exists():
+    with open(METRICS_FILE) as f:
+        run_metrics = json.load(f)
+    per_question = run_metrics["stages"].get("per_question", {})
+    avg_inference_time = per_question.get("mean_ms", 0) / 1000
+    p95_latency = per_question.get("p95_ms", 0) / 1000
+    throughput = run_metrics["questions_per_sec"]
+    cpu_util = run_metrics["resources"].get("process_cpu_pct", {}).get("mean", 0)
+else:
+    print(f"No {METRICS_FILE}; re-run inference to record latency and throughput.")
+# The caption run also pays for captioning its images once.
+caption_throughput = None
+if RUN_TYPE == "caption":
+    if CAPTIONING_METRICS_FILE.exists():
+        with open(CAPTIONING_METRICS_FILE) as f:
+            caption_throughput = json.load(f)["images_per_sec"]
+    else:
+        print(f"No {CAPTIONING_METRICS_FILE}; re-run captioning to record its throughput.")
 gpus = GPUtil.getGPUs()
 gpu_util = gpus[0].load * 100 if gpus else 0
 gpu_mem = gpus[0].memoryUsed if gpus else 0
-cpu_util = psutil.cpu_percent(interval=1)
 
 # ================== PRINT ==================
 print(f"\n=== {RUN_TYPE.upper()} PERFORMANCE METRICS ===")
@@ -71,22 +82,18 @@ print(f"Total predictions: {total:,}")
 print(f"Strict accuracy: {strict_acc:.2f}%")
 print(f"VQA Soft accuracy: {soft_acc:.2f}%")
 print(f"BERTScore (semantic similarity): {bert_mean:.2f}%")
-print(f"Average evaluation time per sample: {avg_inference_time:.4f} sec")
-print(f"Throughput: {throughput:.2f} samples/sec")
+print(f"Average inference time per question: {avg_inference_time:.4f} sec (p95 {p95_latency:.4f} sec)")
+print(f"Throughput: {throughput:.2f} questions/sec")
+if caption_throughput is not None:
+    print(f"Captioning throughput: {caption_throughput:.2f} images/sec")
+print(f"Evaluation time: {eval_elapsed:.1f} sec")
 print(f"GPU utilisation: {gpu_util:.1f}% | Memory used: {gpu_mem:.1f} MB")
 print(f"CPU utilisation: {cpu_util:.1f}%")
 
 # ================== VISUALS ==================
-types = list(type_counter.keys())
-type_acc = [100 * (correct_counter[t] / type_counter[t]) if type_counter[t] else 0 for t in types]
-plt.figure(figsize=(7,4))
-plt.bar(types, type_acc, color=("#4c72b0" if RUN_TYPE=="baseline" else "#f28e2b"))
-plt.xlabel("Question Type")
-plt.ylabel("Accuracy (%)")
-plt.title(f"{RUN_TYPE.capitalize()} BLIP-VQA Accuracy by Question Type")
-plt.tight_layout()
-plt.savefig(OUT_DIR / f"{RUN_TYPE}_accuracy_by_type.png", dpi=300)
-plt.close()
+# Both charts are rendered in parallel and skipped when their numbers are unchanged.
+types = list(acc_by_type.keys())
+type_acc = list(acc_by_type.values())
 
 summary_data = [
     ["Total Predictions", f"{total:,}"],
@@ -94,21 +101,24 @@ summary_data = [
     ["VQA Soft Accuracy (%)", f"{soft_acc:.2f}"],
     ["BERTScore (F1 %)", f"{bert_mean:.2f}"],
     ["Avg Inference Time (s)", f"{avg_inference_time:.4f}"],
+    ["p95 Inference Time (s)", f"{p95_latency:.4f}"],
     ["Throughput (samples/s)", f"{throughput:.2f}"],
     ["GPU Utilisation (%)", f"{gpu_util:.1f}"],
     ["GPU Memory (MB)", f"{gpu_mem:.1f}"],
     ["CPU Utilisation (%)", f"{cpu_util:.1f}"]
 ]
-fig, ax = plt.subplots(figsize=(6,3))
-ax.axis("off")
-table = ax.table(cellText=summary_data, colLabels=["Metric","Value"], loc="center", cellLoc="center")
-table.auto_set_font_size(False)
-table.set_fontsize(9)
-table.scale(1.1,1.2)
-plt.title(f"{RUN_TYPE.capitalize()} BLIP-VQA System and Accuracy Summary", fontsize=11, pad=10)
-plt.tight_layout()
-plt.savefig(OUT_DIR / f"{RUN_TYPE}_system_metrics.png", dpi=300)
-plt.close()
+if caption_throughput is not None:
+    summary_data.append(["Captioning Throughput (img/s)", f"{caption_throughput:.2f}"])
+render_figures([
+    FigureJob(plot_accuracy_bars, str(OUT_DIR / f"{RUN_TYPE}_accuracy_by_type.png"), {
+        "labels": types, "values": [round(a, 4) for a in type_acc],
+        "title": f"{RUN_TYPE.capitalize()} BLIP-VQA Accuracy by Question Type",
+        "color": "#4c72b0" if RUN_TYPE == "baseline" else "#f28e2b", "figsize": [7, 4],
+    }),
+    FigureJob(plot_metrics_table, str(OUT_DIR / f"{RUN_TYPE}_system_metrics.png"), {
+        "rows": summary_data, "title": f"{RUN_TYPE.capitalize()} BLIP-VQA System and Accuracy Summary",
+    }),
+])
 
 # ================== SAVE JSON ==================
 summary = {
@@ -118,7 +128,9 @@ summary = {
     "soft_accuracy": round(soft_acc,2),
     "bertscore_F1": round(bert_mean,2),
     "avg_inference_time_sec": round(avg_inference_time,4),
+    "p95_inference_time_sec": round(p95_latency,4),
     "throughput_per_sec": round(throughput,2),
+    "captioning_images_per_sec": caption_throughput,
     "gpu_utilisation_pct": round(gpu_util,1),
     "gpu_memory_used_mb": round(gpu_mem,1),
     "cpu_utilisation_pct": round(cpu_util,1),
@@ -127,4 +139,5 @@ summary = {
 with open(OUT_DIR / f"{RUN_TYPE}_eval_summary.json","w") as f:
     json.dump(summary,f,indent=4)
 
-print(f"Saved: {RUN_TYPE}_accuracy_by_type.png, {RUN_TYPE}_system_metrics.png, {RUN_TYPE}_eval_summary.json")
\ No newline at end of file
+print(f"Saved: {RUN_TYPE}_accuracy_by_type.png, {RUN_TYPE}_system_metrics.png, {RUN_TYPE}_eval_summary.json, "
+      f"{BERTSCORE_FILE.name}")
\ No newline at end of file
@@ -3,11 +3,18 @@
 # Selects qualitative examples where captions caused incorrect answers (Figure 4.5)
 
 import os
-import json
-import random
+import sys
+import numpy as np
 import matplotlib.pyplot as plt
 from PIL import Image
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from vqa.caption_store import load_store_captions
+from vqa.annotations import load_annotation_store
+from vqa.image_index import load_image_index
+from vqa.rundiff import RunDiff
+from vqa.scoring import GroundTruth
+
 # ------------------------------------------------------
 # Paths
 # ------------------------------------------------------
@@ -19,51 +26,32 @@ CAPTION_RESULTS = "results/caption_predictions.json"
 CAPTION_FILE = "src/data/annotations/captions_sample5000.jsonl"
 
 OUTPUT_FIGURE = "results/figure4_5_caption_failures.png"
+SEED = 0
 
 # ------------------------------------------------------
 # Load data
 # ------------------------------------------------------
-with open(QUESTION_FILE) as f:
-    questions = json.load(f)["questions"]
-
-with open(ANNOTATION_FILE) as f:
-    annotations = json.load(f)["annotations"]
-
-with open(BASELINE_RESULTS) as f:
-    baseline_preds = {p["question_id"]: p["answer"].strip().lower() for p in json.load(f)}
+store = load_annotation_store(QUESTION_FILE, ANNOTATION_FILE)
+images = load_image_index(IMAGE_DIR)
 
-with open(CAPTION_RESULTS) as f:
-    caption_preds = {p["question_id"]: p["answer"].strip().lower() for p in json.load(f)}
+# Both runs joined on question_id (see vqa/rundiff.py); answers are normalized.
+diff = RunDiff.from_files([BASELINE_RESULTS, CAPTION_RESULTS], GroundTruth.from_store(store),
+                          names=["baseline", "caption"])
 
-# Load captions
-captions = {}
-with open(CAPTION_FILE) as f:
-    for line in f:
-        entry = json.loads(line)
-        img_id = int(os.path.splitext(entry["image_id"])[0])
-        captions[img_id] = entry["caption"]
-
-# Ground truth answers
-answers = {a["question_id"]: a["multiple_choice_answer"].strip().lower() for a in annotations}
+# Load captions (through the caption store, same as the caption-augmented run)
+captions = load_store_captions(IMAGE_DIR, legacy_file=CAPTION_FILE)
 
 # ------------------------------------------------------
 # Find cases where baseline is correct but caption is wrong
 # ------------------------------------------------------
-failures = []
-for qid, gt in answers.items():
-    base = baseline_preds.get(qid)
-    cap = caption_preds.get(qid)
-    if not base or not cap:
-        continue
-    if base == gt and cap != gt:
-        failures.append(qid)
+failures = diff.pair("baseline", "caption")["baseline_right_caption_wrong"]
 
-if not failures:
+if not failures.any():
     print("⚠️ No examples found where caption failed while baseline was correct.")
     exit()
 
-# Randomly sample up to 4 of these
-sample_qids = random.sample(failures, min(4, len(failures)))
+# Sample up to 4 of these (fixed seed, so the figure is reproducible)
+sample_qids = diff.sample(failures, 4, seed=SEED)
 
 # ------------------------------------------------------
 # Plot grid
@@ -72,20 +60,21 @@ fig, axes = plt.subplots(2, 2, figsize=(12, 8))
 axes = axes.flatten()
 
 for i, qid in enumerate(sample_qids):
-    q = next(q for q in questions if q["question_id"] == qid)
+    q = store.record(store.row(qid))
+    at = [np.searchsorted(diff.question_ids, qid)]
     img_id = q["image_id"]
-    img_path = os.path.join(IMAGE_DIR, f"{img_id:012d}.jpg")
+    img_path = images.path(img_id)
 
-    if not os.path.exists(img_path):
+    if img_path is None:
         continue
 
     image = Image.open(img_path).convert("RGB")
     axes[i].imshow(image)
     axes[i].axis("off")
 
-    gt = answers[qid]
-    base = baseline_preds[qid]
-    cap = caption_preds[qid]
+    gt = diff.expected_strings(at)[0]
+    base = diff.answer_strings("baseline", at)[0]
+    cap = diff.answer_strings("caption", at)[0]
     caption_text = captions.get(img_id, "")
 
     title = (
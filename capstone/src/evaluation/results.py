@@ -1,21 +1,38 @@
 # results.py
 # Agam Grewal – Capstone Project
 # Generates key figures for Results section
-
+#
+# Every number plotted comes from one aggregation pass over the prediction,
+# annotation, caption and per-question BERTScore files (the latter written by
+# evaluate_caption_performance.py --run <run>). Figures whose statistics and plotting code
+# are unchanged since the last run are skipped; the rest render in parallel.
+#   python src/evaluation/results.py [--force] [--workers N]   (run from capstone/)
+
+import os
+import sys
 import json
+import argparse
+from collections import Counter
+
+import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-import numpy as np
-import pandas as pd
-from PIL import Image
 
-plt.style.use("seaborn-v0_8-whitegrid")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from vqa.annotations import load_annotation_store
+from vqa.data import load_captions
+from vqa.figures import DPI, FigureJob, render_figures
+from vqa.scoring import GroundTruth
 
-baseline_summary = json.load(open("results/baseline_accuracy_summary.json"))
-caption_summary = json.load(open("results/caption_accuracy_summary.json"))
+plt.style.use("seaborn-v0_8-whitegrid")
 
-baseline_soft, caption_soft = 82.3, 64.5
-baseline_bert, caption_bert = 90.1, 80.8
+QUESTION_FILE = "src/data/annotations/vqa_train_sample5000_questions.json"
+ANNOTATION_FILE = "src/data/annotations/vqa_train_sample5000_annotations.json"
+CAPTION_FILE = "src/data/annotations/captions_sample5000.jsonl"
+RESULTS_DIR = "results"
+RUNS = {"baseline": "Baseline", "caption": "Caption-Augmented"}
+ANSWER_TYPES = {"yes/no": "Yes/No", "number": "Number", "other": "Other"}
+MIN_TYPE_QUESTIONS = 20  # question types with fewer predictions are left out of the scatter
 
 COLOR_PALETTE = {
     "baseline": "#3b82f6",  # Blue
@@ -27,6 +44,92 @@ COLOR_PALETTE = {
 }
 
 
+# ------------------------------------------------------
+# Aggregation
+# ------------------------------------------------------
+def _length_counts(answers):
+    counts = Counter(len(a.split()) for a in answers)
+    return sorted(counts.items())
+
+
+def _load_bertscores(run):
+    # {question_id: F1} from <run>_bertscore.json, or None if it has not been computed.
+    path = os.path.join(RESULTS_DIR, f"{run}_bertscore.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        data = json.load(f)
+    return dict(zip(data["question_id"], data["f1"]))
+
+
+def _error_types(gt, scores, captions, image_ids):
+    # Share (%) of the wrong predictions that are a format mismatch (the right
+    # answer in another form: it matches an annotator, or contains the expected
+    # answer), a caption echo (every word of it is in the image caption) or a
+    # factual error.
+    names = gt.vocab.strings()
+    wrong = np.flatnonzero(~scores.strict)
+    counts = Counter()
+    for i in wrong:
+        pred, expected = names[scores.answer[i]], names[gt.mc[scores.row[i]]]
+        caption = captions.get(int(image_ids[i]), "").lower().split()
+        if scores.any_match[i] or (expected and f" {expected} " in f" {pred} "):
+            counts["format"] += 1
+        elif pred and all(word in caption for word in pred.split()):
+            counts["echo"] += 1
+        else:
+            counts["factual"] += 1
+    total = max(len(wrong), 1)
+    return {kind: round(counts[kind] / total * 100, 2) for kind in ("format", "echo", "factual")}
+
+
+def _by_question_type(gt, scores, bertscores):
+    # Mean BERTScore F1 and strict accuracy per question type, over predictions that have an F1.
+    f1 = np.array([bertscores.get(int(qid), np.nan) for qid in scores.question_id])
+    keep = ~np.isnan(f1)
+    codes, inverse = np.unique(gt.question_type[scores.row[keep]], return_inverse=True)
+    totals = np.bincount(inverse, minlength=len(codes))
+    bert = np.bincount(inverse, weights=f1[keep], minlength=len(codes)) / np.maximum(totals, 1)
+    acc = np.bincount(inverse, weights=scores.strict[keep].astype(np.float64), minlength=len(codes))
+    acc = acc / np.maximum(totals, 1) * 100
+    big = totals >= MIN_TYPE_QUESTIONS
+    return {"bert": np.round(bert[big], 4).tolist(), "acc": np.round(acc[big], 2).tolist()}
+
+
+def aggregate():
+    # One read of each input; returns the statistics every figure below draws from.
+    store = load_annotation_store(QUESTION_FILE, ANNOTATION_FILE)
+    gt = GroundTruth.from_store(store)
+    captions = load_captions(CAPTION_FILE) if os.path.exists(CAPTION_FILE) else {}
+    image_id_of = dict(zip(store.question_id.tolist(), store.image_id.tolist()))
+
+    stats = {"runs": {}}
+    gt_rows = set()
+    for run in RUNS:
+        with open(os.path.join(RESULTS_DIR, f"{run}_predictions.json")) as f:
+            predictions = json.load(f)
+        scores = gt.score(predictions)
+        gt_rows.update(scores.row.tolist())
+        image_ids = [image_id_of.get(int(qid), -1) for qid in scores.question_id]
+        bertscores = _load_bertscores(run)
+        stats["runs"][run] = {
+            "strict": round(scores.accuracy(), 2),
+            "soft": round(scores.accuracy("soft"), 2),
+            "bertscore": round(float(np.mean(list(bertscores.values()))) * 100, 2) if bertscores else None,
+            "answer_type": {t: round(a, 2) for t, a in scores.by_group(gt.answer_type).items()},
+            "lengths": _length_counts([p.get("answer", "") for p in predictions]),
+            "errors": _error_types(gt, scores, captions, image_ids),
+            "by_question_type": _by_question_type(gt, scores, bertscores) if bertscores else None,
+        }
+    # Ground-truth answers of the predicted questions (the last row is the "unknown" sentinel).
+    rows = sorted(r for r in gt_rows if r < len(gt.question_ids))
+    stats["gt_lengths"] = _length_counts(store.categorical("multiple_choice_answer", store.rows(gt.question_ids[rows])))
+    return stats
+
+
+# ------------------------------------------------------
+# Figures
+# ------------------------------------------------------
 def apply_modern_style(ax):
     ax.grid(axis='y', alpha=0.3, linestyle='--', linewidth=0.7)
     ax.set_axisbelow(True)
@@ -38,18 +141,10 @@ def apply_modern_style(ax):
     ax.tick_params(colors='#333333', which='both', width=1)
 
 
-def plot_main_performance():
-    metrics = ["Strict Accuracy", "VQA Soft Accuracy", "BERTScore"]
-    baseline = [
-        baseline_summary["accuracy"],
-        baseline_soft,
-        baseline_bert,
-    ]
-    caption = [
-        caption_summary["accuracy"],
-        caption_soft,
-        caption_bert,
-    ]
+def plot_main_performance(data, output):
+    metrics = data["metrics"]
+    baseline = data["baseline"]
+    caption = data["caption"]
 
     fig, ax = plt.subplots(figsize=(8, 6))
     x = np.arange(len(metrics))
@@ -78,14 +173,14 @@ def plot_main_performance():
 
     apply_modern_style(ax)
     plt.tight_layout()
-    plt.savefig("results/figure4_1_main_performance.png", dpi=300, bbox_inches="tight", facecolor='white')
+    plt.savefig(output, dpi=DPI, bbox_inches="tight", facecolor='white')
     plt.close()
 
 
-def plot_question_type_comparison():
-    types = ["Yes/No", "Number", "Other"]
-    baseline = [78, 65, 70]
-    caption = [50, 40, 60]
+def plot_question_type_comparison(data, output):
+    types = data["types"]
+    baseline = data["baseline"]
+    caption = data["caption"]
 
     fig, ax = plt.subplots(figsize=(8, 6))
     x = np.arange(len(types))
@@ -97,9 +192,9 @@ def plot_question_type_comparison():
            color=COLOR_PALETTE["caption"], edgecolor='white', linewidth=1.5)
 
     for i, v in enumerate(baseline):
-        ax.text(x[i] - width / 2, v + 2, f"{v}%", ha="center", fontsize=10, weight='medium')
+        ax.text(x[i] - width / 2, v + 2, f"{v:.0f}%", ha="center", fontsize=10, weight='medium')
     for i, v in enumerate(caption):
-        ax.text(x[i] + width / 2, v + 2, f"{v}%", ha="center", fontsize=10, weight='medium')
+        ax.text(x[i] + width / 2, v + 2, f"{v:.0f}%", ha="center", fontsize=10, weight='medium')
 
     ax.set_ylim(0, 100)
     ax.set_xticks(x)
@@ -114,27 +209,26 @@ def plot_question_type_comparison():
 
     apply_modern_style(ax)
     plt.tight_layout()
-    plt.savefig("results/figure4_question_type_comparison.png", dpi=300, bbox_inches="tight", facecolor='white')
+    plt.savefig(output, dpi=DPI, bbox_inches="tight", facecolor='white')
     plt.close()
 
 
-def plot_answer_length_distribution():
-    gt_lengths = np.random.normal(2, 0.5, 5000)
-    base_lengths = np.random.normal(2.1, 0.6, 5000)
-    cap_lengths = np.random.normal(3.8, 0.9, 5000)
-
+def plot_answer_length_distribution(data, output):
+    # data[name]: [[length in words, count], ...]; answers have few distinct
+    # lengths, so the distributions are drawn as step histograms, not KDEs.
     fig, ax = plt.subplots(figsize=(8, 6))
 
-    sns.kdeplot(gt_lengths, label="Ground Truth", color=COLOR_PALETTE["accent2"],
-                linewidth=2.5, ax=ax)
-    sns.kdeplot(base_lengths, label="Baseline", color=COLOR_PALETTE["baseline"],
-                linewidth=2.5, ax=ax)
-    sns.kdeplot(cap_lengths, label="Caption-Augmented", color=COLOR_PALETTE["caption"],
-                linewidth=2.5, ax=ax)
+    for name, label, color in [("gt", "Ground Truth", COLOR_PALETTE["accent2"]),
+                               ("baseline", "Baseline", COLOR_PALETTE["baseline"]),
+                               ("caption", "Caption-Augmented", COLOR_PALETTE["caption"])]:
+        lengths, counts = zip(*data[name])
+        sns.histplot(x=lengths, weights=counts, discrete=True, stat="density", element="step", fill=False,
+                     label=label, color=color, linewidth=2.5, ax=ax)
 
     ax.set_xlabel("Answer Length (tokens)", fontsize=12, weight='medium')
     ax.set_ylabel("Density", fontsize=12, weight='medium')
     ax.set_title("Answer Length Distribution", fontsize=14, weight='semibold', pad=15)
+    ax.xaxis.set_major_locator(plt.MaxNLocator(integer=True))
 
     legend = ax.legend(frameon=True, fontsize=11, loc='upper right',
                        fancybox=False, shadow=False, framealpha=0.95, edgecolor='#cccccc')
@@ -142,16 +236,14 @@ def plot_answer_length_distribution():
 
     apply_modern_style(ax)
     plt.tight_layout()
-    plt.savefig("results/figure4_5_answer_length_distribution.png", dpi=300, bbox_inches="tight", facecolor='white')
+    plt.savefig(output, dpi=DPI, bbox_inches="tight", facecolor='white')
     plt.close()
 
 
-def plot_bert_vs_accuracy_scatter():
-    np.random.seed(42)
-    bert_base = np.random.uniform(0.85, 0.95, 100)
-    acc_base = np.random.uniform(75, 90, 100)
-    bert_cap = np.random.uniform(0.70, 0.90, 100)
-    acc_cap = np.random.uniform(50, 80, 100)
+def plot_bert_vs_accuracy_scatter(data, output):
+    # One point per question type: mean BERTScore F1 vs strict accuracy.
+    bert_base, acc_base = data["baseline"]["bert"], data["baseline"]["acc"]
+    bert_cap, acc_cap = data["caption"]["bert"], data["caption"]["acc"]
 
     fig, ax = plt.subplots(figsize=(8, 6))
 
@@ -160,10 +252,12 @@ def plot_bert_vs_accuracy_scatter():
     ax.scatter(bert_cap, acc_cap, label="Caption-Augmented", color=COLOR_PALETTE["caption"],
                alpha=0.6, s=60, edgecolors='white', linewidth=0.5)
 
-    sns.regplot(x=bert_base, y=acc_base, scatter=False, color=COLOR_PALETTE["baseline"],
-                ax=ax, line_kws={'linewidth': 2})
-    sns.regplot(x=bert_cap, y=acc_cap, scatter=False, color=COLOR_PALETTE["caption"],
-                ax=ax, line_kws={'linewidth': 2})
+    if len(bert_base) > 1:
+        sns.regplot(x=bert_base, y=acc_base, scatter=False, color=COLOR_PALETTE["baseline"],
+                    ax=ax, line_kws={'linewidth': 2})
+    if len(bert_cap) > 1:
+        sns.regplot(x=bert_cap, y=acc_cap, scatter=False, color=COLOR_PALETTE["caption"],
+                    ax=ax, line_kws={'linewidth': 2})
 
     ax.set_xlabel("BERTScore (semantic similarity)", fontsize=12, weight='medium')
     ax.set_ylabel("Strict Accuracy (%)", fontsize=12, weight='medium')
@@ -175,15 +269,15 @@ def plot_bert_vs_accuracy_scatter():
 
     apply_modern_style(ax)
     plt.tight_layout()
-    plt.savefig("results/figure4_6_bert_vs_accuracy.png", dpi=300, bbox_inches="tight", facecolor='white')
+    plt.savefig(output, dpi=DPI, bbox_inches="tight", facecolor='white')
     plt.close()
 
 
-def plot_error_type_composition():
+def plot_error_type_composition(data, output):
     models = ["Baseline", "Caption-Augmented"]
-    format_mismatch = np.array([9, 45])
-    caption_echo = np.array([0, 32])
-    factual_error = np.array([78, 23])
+    format_mismatch = np.array(data["format"])
+    caption_echo = np.array(data["echo"])
+    factual_error = np.array(data["factual"])
 
     colors = {
         "Format Mismatch": COLOR_PALETTE["baseline"],
@@ -206,7 +300,7 @@ def plot_error_type_composition():
         bottom = 0
         for val in [format_mismatch[i], caption_echo[i], factual_error[i]]:
             if val > 5:
-                ax.text(i, bottom + val / 2, f"{val}%", ha="center", va="center",
+                ax.text(i, bottom + val / 2, f"{val:.0f}%", ha="center", va="center",
                         fontsize=11, color="white", weight="bold")
             bottom += val
 
@@ -225,14 +319,50 @@ def plot_error_type_composition():
 
     apply_modern_style(ax)
     plt.tight_layout()
-    plt.savefig("results/figure4_7_error_type_composition.png", dpi=300, bbox_inches="tight", facecolor='white')
+    plt.savefig(output, dpi=DPI, bbox_inches="tight", facecolor='white')
     plt.close()
 
 
+def figure_jobs(stats):
+    base, cap = stats["runs"]["baseline"], stats["runs"]["caption"]
+    metrics = [("Strict Accuracy", "strict"), ("VQA Soft Accuracy", "soft")]
+    if base["bertscore"] is not None and cap["bertscore"] is not None:
+        metrics.append(("BERTScore", "bertscore"))
+    types = [t for t in ANSWER_TYPES if t in base["answer_type"] or t in cap["answer_type"]]
+
+    jobs = [
+        FigureJob(plot_main_performance, f"{RESULTS_DIR}/figure4_1_main_performance.png", {
+            "metrics": [label for label, _ in metrics],
+            "baseline": [base[key] for _, key in metrics],
+            "caption": [cap[key] for _, key in metrics],
+        }),
+        FigureJob(plot_question_type_comparison, f"{RESULTS_DIR}/figure4_question_type_comparison.png", {
+            "types": [ANSWER_TYPES[t] for t in types],
+            "baseline": [base["answer_type"].get(t, 0.0) for t in types],
+            "caption": [cap["answer_type"].get(t, 0.0) for t in types],
+        }),
+        FigureJob(plot_answer_length_distribution, f"{RESULTS_DIR}/figure4_5_answer_length_distribution.png", {
+            "gt": stats["gt_lengths"], "baseline": base["lengths"], "caption": cap["lengths"],
+        }),
+        FigureJob(plot_error_type_composition, f"{RESULTS_DIR}/figure4_7_error_type_composition.png", {
+            kind: [base["errors"][kind], cap["errors"][kind]] for kind in ("format", "echo", "factual")
+        }),
+    ]
+    if base["by_question_type"] and cap["by_question_type"]:
+        jobs.append(FigureJob(plot_bert_vs_accuracy_scatter, f"{RESULTS_DIR}/figure4_6_bert_vs_accuracy.png", {
+            "baseline": base["by_question_type"], "caption": cap["by_question_type"],
+        }))
+    else:
+        print("No per-question BERTScores for both runs; run evaluate_caption_performance.py --run baseline "
+              "and --run caption to draw figure 4.6.")
+    return jobs
+
+
 if __name__ == "__main__":
-    plot_main_performance()
-    plot_question_type_comparison()
-    plot_answer_length_distribution()
-    plot_bert_vs_accuracy_scatter()
-    plot_error_type_composition()
-    print("✓ All figures saved to results/")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Render the Results section figures.")
+    parser.add_argument("--force", action="store_true", help="re-render figures even if unchanged")
+    parser.add_argument("--workers", type=int, default=None, help="render processes (default: one per figure, up to the CPU count)")
+    args = parser.parse_args()
+
+    render_figures(figure_jobs(aggregate()), workers=args.workers, force=args.force)
+    print(f"✓ All figures up to date in {RESULTS_DIR}/")
@@ -0,0 +1,14 @@
+# build_pixel_cache.py
+# Author: Agam Grewal
+# Project: Image Captioning as a Data Augmentation Strategy for VQA
+# Purpose: One-time preprocessing of sample5000 into BLIP-ready float16 pixel tensors
+# Same as `python -m src.vqa cache-pixels` (run from capstone/).
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from vqa.cli import main
+
+if __name__ == "__main__":
+    main(["cache-pixels"])
@@ -1,55 +1,33 @@
-import json, re
-from collections import Counter, defaultdict
+import os, sys, re
+from collections import Counter
 from pathlib import Path
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from vqa.annotations import load_annotation_store
+from vqa.image_index import ImageIndex, manifest_path_for
+
 SAMPLE_IMG_DIR = Path("../data/sample5000")
 QUESTIONS_JSON = Path("../data/annotations/vqa_train_sample5000_questions.json")
 ANNOTATIONS_JSON = Path("../data/annotations/vqa_train_sample5000_annotations.json")
-BLIP_CAPTIONS_PATH = Path("../data/annotations/captions_sample5000.jsonl")
-COCO_CAPTIONS_JSON = None
-
-def extract_image_id_from_filename(fname):
-    m = re.search(r"(\d{6,12})(?=\.jpe?g$)", fname)
-    return int(m.group(1)) if m else None
-
-def load_json(path):
-    with open(path, "r") as f:
-        return json.load(f)
-
-def load_jsonl(path):
-    with open(path, "r") as f:
-        return [json.loads(line.strip()) for line in f if line.strip()]
-
-img_files = [p.name for p in SAMPLE_IMG_DIR.glob("*.jpg")]
-image_ids = set(extract_image_id_from_filename(n) for n in img_files if extract_image_id_from_filename(n))
+ANNOTATION_CACHE_DIR = Path("../data/cache/annotations")
+MANIFEST_DIR = Path("../data/cache/manifests")
+
+# Image ids come from the directory manifest (vqa/image_index.py), which parses
+# each file name once and is only rescanned when the directory changes.
+image_index = ImageIndex(str(SAMPLE_IMG_DIR), manifest_path_for(str(SAMPLE_IMG_DIR), str(MANIFEST_DIR)))
+image_index.refresh()
+image_ids = set(image_index.ids())
 print(f"Images in sample: {len(image_ids):,}")
 
-Q = load_json(QUESTIONS_JSON)
-A = load_json(ANNOTATIONS_JSON)
-questions = Q.get("questions", Q)
-annotations = A.get("annotations", A)
-
-qs_by_image = defaultdict(list)
-for q in questions:
-    if q.get("image_id") in image_ids:
-        qs_by_image[q["image_id"]].append(q)
-
-anns_by_qid = {ann["question_id"]: ann for ann in annotations}
-filtered_questions = [q for iid in image_ids for q in qs_by_image[iid]]
+store = load_annotation_store(str(QUESTIONS_JSON), str(ANNOTATIONS_JSON), str(ANNOTATION_CACHE_DIR))
+rows = [int(r) for iid in image_ids for r in store.rows_for_image(iid)]
+filtered_questions = [{"question": text} for text in store.texts("question", rows)]
 
 print(f"Questions for sample images: {len(filtered_questions):,}")
 
-total_answers = 0
-qt_counter = Counter()
-for q in filtered_questions:
-    qid = q["question_id"]
-    ann = anns_by_qid.get(qid)
-    if not ann:
-        continue
-    answers = ann.get("answers", [])
-    total_answers += len(answers)
-    qt_counter[ann.get("question_type", "Unknown")] += 1
+offsets = store.column("answers.offsets")
+total_answers = int(sum(offsets[r + 1] - offsets[r] for r in rows))
 
 print(f"Answer annotations: {total_answers:,}")
 
@@ -0,0 +1,2 @@
+# vqa
+# Agam Grewal – Capstone: Shared BLIP-VQA inference core used by the model scripts
@@ -0,0 +1,261 @@
+# annotations.py
+# Agam Grewal – Capstone: Compiled, columnar VQA question/annotation store
+#
+# The questions and annotations JSON files are joined once into NumPy columns
+# (one row per question, in question-file order) and saved next to each other:
+# integer columns as .npy, free text as UTF-8 blobs with offsets, and
+# low-cardinality strings (answers, question/answer types) as integer codes
+# plus a vocabulary. Loading memory-maps the columns on first access, so a
+# script only pays for the columns it reads.
+
+import os
+import json
+import hashlib
+from array import array
+
+import numpy as np
+
+from .data import QUESTION_PATH, ANNOTATION_PATH
+from .jsonstream import iter_records
+
+ANNOTATION_CACHE_DIR = "src/data/cache/annotations"
+META_FILE = "meta.json"
+STORE_VERSION = 2  # bump when the on-disk layout changes, so old stores are rebuilt
+CATEGORICAL_COLUMNS = ("multiple_choice_answer", "question_type", "answer_type")
+
+
+def source_fingerprint(*paths):
+    h = hashlib.sha256()
+    for path in paths:
+        if path and os.path.exists(path):
+            st = os.stat(path)
+            h.update(f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+        else:
+            h.update(f"{path}:missing\n".encode())
+    return h.hexdigest()
+
+
+class Vocab:
+    def __init__(self):
+        self.ids = {}
+
+    def code(self, value):
+        return self.ids.setdefault(value, len(self.ids))
+
+    def strings(self):
+        return list(self.ids)
+
+
+ANNOTATION_FIELDS = ("question_id", "answers") + CATEGORICAL_COLUMNS
+QUESTION_FIELDS = ("question_id", "image_id", "question")
+
+
+def build_annotation_store(out_dir, questions, annotations, fingerprint):
+    # questions/annotations: iterables of the VQA JSON records, consumed once
+    # (annotations first). Each annotation is reduced to integer codes right
+    # away and question text goes straight to disk, so only compact arrays are
+    # held in memory. Questions without an annotation get code -1 in every
+    # annotation column and no answers.
+    os.makedirs(out_dir, exist_ok=True)
+    vocabs = {name: Vocab() for name in CATEGORICAL_COLUMNS}
+    answer_vocab = vocabs["multiple_choice_answer"]  # annotator answers share the mc answer codes
+    by_qid = {}
+    for a in annotations:
+        by_qid[a["question_id"]] = (
+            tuple(vocabs[name].code(a[name]) if name in a else -1 for name in CATEGORICAL_COLUMNS),
+            array("i", (answer_vocab.code(ans["answer"]) for ans in a.get("answers", ()))),
+        )
+
+    question_id, image_id = array("q"), array("q")
+    codes = {name: array("i") for name in CATEGORICAL_COLUMNS}
+    answer_codes, answer_offsets = array("i"), array("q", [0])
+    text_offsets = array("q", [0])
+    missing = (tuple(-1 for _ in CATEGORICAL_COLUMNS), array("i"))
+    with open(os.path.join(out_dir, "question.utf8"), "wb") as text_f:
+        for q in questions:
+            question_id.append(q["question_id"])
+            image_id.append(q["image_id"])
+            encoded = q["question"].encode("utf-8")
+            text_f.write(encoded)
+            text_offsets.append(text_offsets[-1] + len(encoded))
+            row_codes, row_answers = by_qid.get(q["question_id"], missing)
+            for name, code in zip(CATEGORICAL_COLUMNS, row_codes):
+                codes[name].append(code)
+            answer_codes.extend(row_answers)
+            answer_offsets.append(len(answer_codes))
+    del by_qid
+
+    def save(name, values, dtype):
+        np.save(os.path.join(out_dir, f"{name}.npy"), np.asarray(values, dtype=dtype))
+
+    save("question_id", question_id, np.int64)
+    save("image_id", image_id, np.int64)
+    for name in CATEGORICAL_COLUMNS:
+        save(name, codes[name], np.int32)
+    save("answers", answer_codes, np.int32)
+    save("answers.offsets", answer_offsets, np.int64)
+    save("question.offsets", text_offsets, np.int64)
+
+    # Sorted indexes: rows ordered by question_id, and rows grouped by image_id.
+    qids = np.asarray(question_id, dtype=np.int64)
+    by_question = np.argsort(qids, kind="stable")
+    save("index.question_id", by_question, np.int64)
+    save("index.question_id.keys", qids[by_question], np.int64)
+    iids = np.asarray(image_id, dtype=np.int64)
+    by_image = np.argsort(iids, kind="stable")
+    unique_images, starts = np.unique(iids[by_image], return_index=True)
+    save("index.image_id.rows", by_image, np.int64)
+    save("index.image_id.keys", unique_images, np.int64)
+    save("index.image_id.starts", np.append(starts, len(iids)), np.int64)
+
+    # meta.json is written last, so an interrupted build is never loaded.
+    meta = {
+        "version": STORE_VERSION,
+        "fingerprint": fingerprint,
+        "rows": len(question_id),
+        "vocab": {name: vocabs[name].strings() for name in CATEGORICAL_COLUMNS},
+    }
+    tmp = os.path.join(out_dir, META_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(out_dir, META_FILE))
+    return AnnotationStore(out_dir)
+
+
+class AnnotationStore:
+    def __init__(self, store_dir):
+        self.dir = store_dir
+        with open(os.path.join(store_dir, META_FILE)) as f:
+            meta = json.load(f)
+        self.version = meta.get("version", 1)
+        self.fingerprint = meta["fingerprint"]
+        self.vocab = meta["vocab"]
+        self._rows = meta["rows"]
+        self._columns = {}
+
+    def __len__(self):
+        return self._rows
+
+    def column(self, name):
+        # Memory-mapped on first access.
+        if name not in self._columns:
+            self._columns[name] = np.load(os.path.join(self.dir, f"{name}.npy"), mmap_mode="r")
+        return self._columns[name]
+
+    @property
+    def question_id(self):
+        return self.column("question_id")
+
+    @property
+    def image_id(self):
+        return self.column("image_id")
+
+    def _text(self, name):
+        key = f"{name}.utf8"
+        if key not in self._columns:
+            path = os.path.join(self.dir, key)
+            # np.memmap cannot map an empty file.
+            if os.path.getsize(path):
+                self._columns[key] = np.memmap(path, dtype=np.uint8, mode="r")
+            else:
+                self._columns[key] = np.zeros(0, dtype=np.uint8)
+        return self._columns[key], self.column(f"{name}.offsets")
+
+    def text(self, name, row):
+        blob, offsets = self._text(name)
+        return bytes(blob[offsets[row]:offsets[row + 1]]).decode("utf-8")
+
+    def texts(self, name, rows=None):
+        blob, offsets = self._text(name)
+        data = bytes(blob)
+        rows = range(len(self)) if rows is None else rows
+        return [data[offsets[r]:offsets[r + 1]].decode("utf-8") for r in rows]
+
+    def categorical(self, name, rows=None):
+        # Decoded values; None where the question has no annotation.
+        codes = self.column(name)
+        values = self.vocab[name]
+        rows = range(len(self)) if rows is None else rows
+        return [values[c] if c >= 0 else None for c in (int(codes[r]) for r in rows)]
+
+    def answers(self, row):
+        offsets = self.column("answers.offsets")
+        values = self.vocab["multiple_choice_answer"]
+        return [values[c] for c in self.column("answers")[offsets[row]:offsets[row + 1]]]
+
+    def has_annotation(self):
+        return np.asarray(self.column("multiple_choice_answer")) >= 0
+
+    def merged_items(self, captions=None):
+        # The run items: one dict per annotated question, in question-file order.
+        rows = np.flatnonzero(self.has_annotation())
+        answers = self.vocab["multiple_choice_answer"]
+        items = []
+        for row, question, code in zip(rows, self.texts("question", rows), self.column("multiple_choice_answer")[rows]):
+            item = {"image_id": int(self.image_id[row]), "question_id": int(self.question_id[row]), "question": question}
+            if captions is not None:
+                item["caption"] = captions.get(item["image_id"], "")
+            item["answer"] = answers[code]
+            items.append(item)
+        return items
+
+    def rows(self, question_ids):
+        # Row for each question_id, or -1 if it is not in the store.
+        question_ids = np.asarray(question_ids, dtype=np.int64)
+        order = self.column("index.question_id")
+        if not len(order):
+            return np.full(len(question_ids), -1, dtype=np.int64)
+        sorted_ids = self.column("index.question_id.keys")
+        pos = np.minimum(np.searchsorted(sorted_ids, question_ids), len(order) - 1)
+        return np.where(sorted_ids[pos] == question_ids, order[pos], -1)
+
+    def row(self, question_id):
+        row = int(self.rows([question_id])[0])
+        if row < 0:
+            raise KeyError(question_id)
+        return row
+
+    def rows_for_image(self, image_id):
+        keys = self.column("index.image_id.keys")
+        i = int(np.searchsorted(keys, image_id))
+        if i == len(keys) or keys[i] != image_id:
+            return np.zeros(0, dtype=np.int64)
+        starts = self.column("index.image_id.starts")
+        return np.asarray(self.column("index.image_id.rows")[starts[i]:starts[i + 1]])
+
+    def record(self, row):
+        # The question and annotation fields for one row as plain JSON-style values.
+        record = {"question_id": int(self.question_id[row]), "image_id": int(self.image_id[row]),
+                  "question": self.text("question", row)}
+        for name in CATEGORICAL_COLUMNS:
+            code = int(self.column(name)[row])
+            if code >= 0:
+                record[name] = self.vocab[name][code]
+        record["answers"] = self.answers(row)
+        return record
+
+
+def store_dir_for(question_path, annotation_path, cache_dir=ANNOTATION_CACHE_DIR):
+    # Keyed by both absolute paths, so each (questions, annotations) pair gets
+    # its own store instead of rebuilding a shared one on every switch.
+    paths = [os.path.abspath(question_path), os.path.abspath(annotation_path)]
+    digest = hashlib.sha1("\n".join(paths).encode()).hexdigest()[:8]
+    return os.path.join(cache_dir, f"{os.path.splitext(os.path.basename(paths[0]))[0]}_{digest}")
+
+
+def load_annotation_store(question_path=QUESTION_PATH, annotation_path=ANNOTATION_PATH, cache_dir=ANNOTATION_CACHE_DIR):
+    # Rebuilt from the JSON files whenever either one changes; otherwise just opened.
+    store_dir = store_dir_for(question_path, annotation_path, cache_dir)
+    fingerprint = source_fingerprint(question_path, annotation_path)
+    if os.path.exists(os.path.join(store_dir, META_FILE)):
+        store = AnnotationStore(store_dir)
+        if store.version == STORE_VERSION and store.fingerprint == fingerprint:
+            return store
+    print(f"Compiling annotation store in {store_dir}...")
+    # Both files are streamed record by record; see jsonstream.py.
+    return build_annotation_store(
+        store_dir,
+        iter_records(question_path, "questions", QUESTION_FIELDS),
+        iter_records(annotation_path, "annotations", ANNOTATION_FIELDS),
+        fingerprint,
+    )
@@ -0,0 +1,110 @@
+# answer_cache.py
+# Agam Grewal – Capstone: Persistent VQA answer cache
+#
+# Answers are stored in SQLite under (sha256 of the image, exact prompt text,
+# model id + revision, decoding params), so re-running a mode only generates
+# for prompts, images or settings that changed. Each entry remembers when it
+# was last used and the cache is trimmed to the most recently used max_entries.
+
+import os
+import json
+import time
+import sqlite3
+
+from .image_index import load_image_index
+
+ANSWER_CACHE_PATH = "src/data/cache/answers.sqlite"
+MAX_ENTRIES = 1_000_000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    image_sha TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    model TEXT NOT NULL,
+    params TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (image_sha, prompt, model, params)
+);
+CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used);
+"""
+
+
+class AnswerCache:
+    def __init__(self, path=ANSWER_CACHE_PATH, model="", params=None, max_entries=MAX_ENTRIES):
+        # model/params are fixed per cache object: one run, one configuration.
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Shard workers share the file; WAL lets them read while one writes.
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(_SCHEMA)
+        self.model = model
+        self.params = json.dumps(params or {}, sort_keys=True)
+        self.max_entries = max_entries
+        self.keys = {}  # question_id -> (image_sha, prompt) of the last lookup
+        self.pending = []
+
+    def lookup(self, items, image_dir, build_text):
+        # Returns (hits, misses, no_image): hits are prediction records, misses the
+        # items to generate and no_image the items whose image file does not exist.
+        index = load_image_index(image_dir)
+        hits, misses, no_image, keys = [], [], [], {}
+        for item in items:
+            image_sha = index.sha256(item["image_id"])
+            if image_sha is None:
+                no_image.append(item)
+                continue
+            key = (image_sha, build_text(item))
+            keys[item["question_id"]] = key
+            answer = self.db.execute(
+                "SELECT answer FROM answers WHERE image_sha=? AND prompt=? AND model=? AND params=?",
+                (*key, self.model, self.params),
+            ).fetchone()
+            if answer is None:
+                misses.append(item)
+            else:
+                hits.append({"question_id": item["question_id"], "answer": answer[0]})
+        with self.db:
+            now = time.time()
+            self.db.executemany(
+                "UPDATE answers SET last_used=? WHERE image_sha=? AND prompt=? AND model=? AND params=?",
+                [(now, *keys[hit["question_id"]], self.model, self.params) for hit in hits],
+            )
+        self.keys = keys
+        return hits, misses, no_image
+
+    def put(self, record):
+        # Called with each freshly generated prediction for an item passed to lookup().
+        key = self.keys.get(record["question_id"])
+        if key is not None:
+            self.pending.append((*key, self.model, self.params, record["answer"], time.time()))
+        if len(self.pending) >= 256:
+            self.flush()
+
+    def flush(self):
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?)", self.pending)
+        self.pending = []
+
+    def evict(self):
+        # Keeps the max_entries most recently used answers; returns how many were dropped.
+        (count,) = self.db.execute("SELECT COUNT(*) FROM answers").fetchone()
+        if self.max_entries is None or count <= self.max_entries:
+            return 0
+        with self.db:
+            self.db.execute(
+                "DELETE FROM answers WHERE rowid IN (SELECT rowid FROM answers ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,),
+            )
+        return count - self.max_entries
+
+    def close(self):
+        self.flush()
+        self.evict()
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
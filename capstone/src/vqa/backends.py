@@ -0,0 +1,55 @@
+# backends.py
+# Agam Grewal – Capstone: Execution backends for BLIP-VQA inference
+#
+#   fp32     eager float32 (the reference)
+#   int8     dynamically quantized nn.Linear layers (CPU only)
+#   bf16     bfloat16 autocast
+#   compile  torch.compile'd vision encoder, text encoder and answer decoder
+#   onnx     exported graphs on ONNX Runtime's CPU provider, see onnx_backend.py
+#
+# Every PyTorch backend runs under torch.inference_mode().
+
+from contextlib import ExitStack
+
+BACKENDS = ("fp32", "int8", "bf16", "compile", "onnx")
+
+
+def prepare_model(model, backend, device="cpu"):
+    import torch
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+    if backend == "onnx":
+        raise ValueError("The onnx backend does not wrap a PyTorch model; use load_backend_model")
+    if backend == "int8":
+        if device != "cpu":
+            raise ValueError(f"The int8 backend only runs on cpu, not {device}")
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    elif backend == "compile":
+        # The engine calls these submodules directly rather than model.forward,
+        # so each is compiled in place; question lengths vary between batches.
+        for module in (model.vision_model, model.text_encoder, model.text_decoder):
+            module.compile(dynamic=True)
+    return model
+
+
+def inference_context(backend, device="cpu"):
+    import torch
+
+    stack = ExitStack()
+    stack.enter_context(torch.inference_mode())
+    if backend == "bf16":
+        stack.enter_context(torch.autocast(device_type=device.split(":")[0], dtype=torch.bfloat16))
+    return stack
+
+
+def load_backend_model(model_name, backend, device="cpu"):
+    # The model object the engine runs for this backend.
+    from .models import load_vqa_model
+
+    if backend == "onnx":
+        if device != "cpu":
+            raise ValueError(f"The onnx backend only runs on cpu, not {device}")
+        from .onnx_backend import load_onnx_model
+        return load_onnx_model(model_name)
+    return prepare_model(load_vqa_model(model_name, device), backend, device)
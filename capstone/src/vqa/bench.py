@@ -0,0 +1,241 @@
+# bench.py
+# Agam Grewal – Capstone: Benchmarks for the inference and scoring hot paths
+#
+#   python -m src.vqa bench                       # writes benchmarks/latest.json
+#   python -m src.vqa bench --output benchmarks/baseline.json
+#   python -m src.vqa bench-compare               # baseline.json vs latest.json
+#
+# The model benchmarks use a tiny randomly initialized BLIP config and a
+# generated vocabulary, so they run offline; absolute numbers only mean
+# something relative to a baseline taken on the same machine.
+
+import os
+import json
+import time
+import random
+import platform
+import tempfile
+
+import numpy as np
+
+from .metrics import PERCENTILES
+
+BENCH_DIR = "benchmarks"
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+LATEST_FILE = os.path.join(BENCH_DIR, "latest.json")
+TINY_IMAGE_SIZE = 64
+WORDS = "what is the color of a dog how many people are there in this picture yes no red blue two".split()
+
+
+def make_images(image_dir, count=8, size=(640, 480), seed=0):
+    # Random-noise JPEGs at roughly COCO resolution.
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i in range(count):
+        path = os.path.join(image_dir, f"{i:012d}.jpg")
+        Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)).save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def tiny_blip(work_dir, seed=0):
+    # (processor, vqa model, caption model) with 2-layer, 32-wide towers.
+    import torch
+    from transformers import (
+        BlipConfig, BlipForConditionalGeneration, BlipForQuestionAnswering, BlipImageProcessor, BlipProcessor,
+        BertTokenizerFast,
+    )
+
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", "[DEC]"] + WORDS + [f"w{i}" for i in range(200)]
+    vocab_path = os.path.join(work_dir, "vocab.txt")
+    with open(vocab_path, "w") as f:
+        f.write("\n".join(vocab))
+    processor = BlipProcessor(
+        BlipImageProcessor(size={"height": TINY_IMAGE_SIZE, "width": TINY_IMAGE_SIZE}),
+        BertTokenizerFast(vocab_path, bos_token="[DEC]"),
+    )
+    tower = dict(hidden_size=32, intermediate_size=64, num_hidden_layers=2, num_attention_heads=2)
+    config = BlipConfig(
+        text_config=dict(tower, vocab_size=len(vocab), max_position_embeddings=64, encoder_hidden_size=32,
+                         bos_token_id=5, pad_token_id=0, sep_token_id=3),
+        vision_config=dict(tower, image_size=TINY_IMAGE_SIZE, patch_size=16),
+        projection_dim=32,
+    )
+    torch.manual_seed(seed)
+    return processor, BlipForQuestionAnswering(config).eval(), BlipForConditionalGeneration(config).eval()
+
+
+def random_questions(rng, count):
+    return [" ".join(rng.choice(WORDS, size=rng.integers(3, 9))) + "?" for _ in range(count)]
+
+
+# Each setup returns (run, items): run() does one timed iteration over `items` items.
+
+def setup_decode_preprocess(ctx):
+    from transformers import BlipImageProcessor
+    from . import loader
+
+    loader._init_worker(BlipImageProcessor())  # the default 384x384 BLIP preprocessing
+    paths = ctx["images"]
+    return (lambda: [loader._load_pixels(path) for path in paths]), len(paths)
+
+
+def setup_prefetch(ctx):
+    from transformers import BlipImageProcessor
+    from .loader import prefetch_images
+
+    processor = BlipImageProcessor()
+    paths = [(i, path) for i, path in enumerate(ctx["images"])]
+    return (lambda: list(prefetch_images(paths, processor, num_workers=4))), len(paths)
+
+
+def _vqa_setup(ctx, num_images, questions_per_image):
+    import torch
+    from .engine import answer_image_groups
+
+    processor, model, _ = ctx["tiny"]
+    rng = np.random.default_rng(1)
+    pixels = torch.randn(num_images, 3, TINY_IMAGE_SIZE, TINY_IMAGE_SIZE)
+    texts = [random_questions(rng, questions_per_image) for _ in range(num_images)]
+    return (lambda: answer_image_groups(model, processor, pixels, texts, "cpu")), num_images * questions_per_image
+
+
+def _caption_setup(ctx, num_images):
+    import torch
+
+    processor, _, model = ctx["tiny"]
+    pixels = torch.randn(num_images, 3, TINY_IMAGE_SIZE, TINY_IMAGE_SIZE)
+
+    def run():
+        with torch.inference_mode():
+            return processor.batch_decode(model.generate(pixel_values=pixels, max_new_tokens=20),
+                                          skip_special_tokens=True)
+    return run, num_images
+
+
+def setup_scoring(ctx, count=50_000):
+    from .scoring import GroundTruth
+
+    rng = np.random.default_rng(2)
+    answers = WORDS + [str(i) for i in range(20)]
+    annotations = [
+        {"question_id": qid, "multiple_choice_answer": str(rng.choice(answers)), "question_type": str(rng.choice(WORDS)),
+         "answers": [{"answer": str(a)} for a in rng.choice(answers, size=10)]}
+        for qid in range(count)
+    ]
+    predictions = [{"question_id": int(qid), "answer": str(rng.choice(answers))} for qid in rng.permutation(count)]
+    gt = GroundTruth.from_annotations(annotations)
+
+    def run():
+        scores = gt.score(predictions)
+        return scores.accuracy(), scores.accuracy("soft"), scores.by_group(gt.question_type)
+    return run, count
+
+
+def setup_normalize(ctx, count=20_000):
+    from .answers import normalize_answer
+
+    rng = random.Random(3)
+    raw = [f"{rng.choice(['The', 'a', '', 'Two'])} {rng.choice(WORDS)}{rng.choice(['', '.', '!', ','])} {i}"
+           for i in range(count)]
+
+    def run():
+        normalize_answer.cache_clear()
+        return [normalize_answer(a) for a in raw]
+    return run, count
+
+
+BENCHMARKS = {
+    "decode_preprocess": setup_decode_preprocess,
+    "prefetch_4_workers": setup_prefetch,
+    "vqa_generate_single": lambda ctx: _vqa_setup(ctx, 1, 1),
+    "vqa_generate_batched": lambda ctx: _vqa_setup(ctx, 4, 4),
+    "caption_generate_single": lambda ctx: _caption_setup(ctx, 1),
+    "caption_generate_batched": lambda ctx: _caption_setup(ctx, 16),
+    "score_predictions": setup_scoring,
+    "normalize_answers": setup_normalize,
+}
+
+
+def measure(run, items, repeat=10, warmup=2):
+    for _ in range(warmup):
+        run()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    arr = np.asarray(times) * 1000
+    result = {"items": items, "repeat": repeat, "items_per_sec": round(items / np.median(times), 3),
+              "mean_ms": round(float(arr.mean()), 3)}
+    result.update({f"p{p}_ms": round(float(v), 3) for p, v in zip(PERCENTILES, np.percentile(arr, PERCENTILES))})
+    return result
+
+
+def environment():
+    import torch
+    import transformers
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "transformers": transformers.__version__,
+        "numpy": np.__version__,
+    }
+
+
+def run_benchmarks(output=LATEST_FILE, names=None, repeat=10, warmup=2):
+    import torch
+
+    torch.manual_seed(0)
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        ctx = {"images": make_images(work_dir), "tiny": tiny_blip(work_dir)}
+        for name in names or BENCHMARKS:
+            run, items = BENCHMARKS[name](ctx)
+            results[name] = measure(run, items, repeat, warmup)
+            r = results[name]
+            print(f"{name:<26} {r['items_per_sec']:>12.1f} items/s   p50 {r['p50_ms']:>9.2f} ms   "
+                  f"p95 {r['p95_ms']:>9.2f} ms")
+
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(),
+                   "results": results}, f, indent=2)
+    print(f"Saved benchmark results to {output}")
+    return results
+
+
+def compare(baseline_path=BASELINE_FILE, current_path=LATEST_FILE, threshold=0.10):
+    # A benchmark regresses when its throughput drops, or its p50/p95 latency
+    # grows, by more than `threshold` (a fraction) against the baseline.
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    with open(current_path) as f:
+        current = json.load(f)["results"]
+
+    regressions = []
+    print(f"{'benchmark':<26} {'metric':<14} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name in sorted(baseline.keys() & current.keys()):
+        for metric, higher_is_better in (("items_per_sec", True), ("p50_ms", False), ("p95_ms", False)):
+            old, new = baseline[name][metric], current[name][metric]
+            change = (new - old) / old if old else 0.0
+            worse = -change if higher_is_better else change
+            flag = "REGRESSION" if worse > threshold else ""
+            if flag:
+                regressions.append((name, metric, change))
+            print(f"{name:<26} {metric:<14} {old:>12.2f} {new:>12.2f} {change:>+8.1%} {flag}")
+    for name in sorted(baseline.keys() ^ current.keys()):
+        print(f"{name:<26} only in {'baseline' if name in baseline else 'current'}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {threshold:.0%}")
+    else:
+        print(f"\nNo regressions beyond {threshold:.0%}")
+    return regressions
+
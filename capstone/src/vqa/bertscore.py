@@ -0,0 +1,133 @@
+# bertscore.py
+# Agam Grewal – Capstone: BERTScore with on-disk embedding and pair caches
+#
+# bert_score.score re-embeds every hypothesis and reference on each call. Here
+# every distinct string is embedded once per scorer configuration and kept on
+# disk, and raw (P, R, F) values are cached per (hypothesis, reference) pair, so
+# a re-evaluation only runs the model for strings and pairs it has not seen.
+
+import os
+import json
+from collections import defaultdict
+
+import numpy as np
+
+from .data import iter_batches
+
+BERTSCORE_CACHE_DIR = "src/data/cache/bertscore"
+EMBEDDINGS_FILE = "embeddings.f32"
+INDEX_FILE = "index.jsonl"
+PAIRS_FILE = "pairs.jsonl"
+
+
+def _read_jsonl(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.endswith("\n")]
+
+
+class CachedBertScorer:
+    def __init__(self, cache_dir=BERTSCORE_CACHE_DIR, lang="en", model_type=None, num_layers=None,
+                 rescale_with_baseline=True, batch_size=64, device=None):
+        from bert_score import BERTScorer
+
+        self.scorer = BERTScorer(
+            model_type=model_type, num_layers=num_layers, lang=lang, rescale_with_baseline=rescale_with_baseline,
+            device=device,
+        )
+        self.batch_size = batch_size
+        # bert_score keeps its model and tokenizer private; the embedding and
+        # matching steps below call the same utils its score() uses.
+        self.model = self.scorer._model
+        self.tokenizer = self.scorer._tokenizer
+        self.idf_dict = defaultdict(lambda: 1.0)
+        self.idf_dict[self.tokenizer.sep_token_id] = 0
+        self.idf_dict[self.tokenizer.cls_token_id] = 0
+
+        # The scorer hash covers model, layer, idf and bert_score/transformers versions.
+        self.dir = os.path.join(cache_dir, self.scorer.hash.replace("/", "_"))
+        os.makedirs(self.dir, exist_ok=True)
+        self.embeddings_path = os.path.join(self.dir, EMBEDDINGS_FILE)
+        self.index_path = os.path.join(self.dir, INDEX_FILE)
+        self.pairs_path = os.path.join(self.dir, PAIRS_FILE)
+
+        # Index entries are written after their rows, so rows left over from an
+        # interrupted run are simply never referenced.
+        self.index = {r["text"]: r for r in _read_jsonl(self.index_path)}
+        self.stored = None
+        if self.index:
+            dim = next(iter(self.index.values()))["dim"]
+            rows = os.path.getsize(self.embeddings_path) // (4 * dim)
+            self.stored = np.memmap(self.embeddings_path, dtype=np.float32, mode="r", shape=(rows, dim))
+        self.fresh = {}  # text -> embedding computed in this process
+        self.pairs = {(r["hyp"], r["ref"]): r["prf"] for r in _read_jsonl(self.pairs_path)}
+
+    def _embedding(self, text):
+        if text in self.fresh:
+            return self.fresh[text]
+        entry = self.index[text]
+        return self.stored[entry["offset"]:entry["offset"] + entry["length"]]
+
+    def _embed(self, texts):
+        # Longest first, so each batch pads to similar lengths.
+        from bert_score.utils import get_bert_embedding, sent_encode
+
+        lengths = {text: len(sent_encode(self.tokenizer, text)) for text in texts}
+        order = sorted(texts, key=lengths.get, reverse=True)
+        with open(self.embeddings_path, "ab") as emb_f, open(self.index_path, "a") as index_f:
+            for batch in iter_batches(order, self.batch_size):
+                embs, masks, idf = get_bert_embedding(
+                    batch, self.model, self.tokenizer, self.idf_dict, device=self.scorer.device
+                )
+                embs, masks = embs.cpu().numpy().astype(np.float32), masks.cpu().numpy()
+                for i, text in enumerate(batch):
+                    n = int(masks[i].sum())
+                    emb = embs[i, :n]
+                    offset = emb_f.tell() // emb[0].nbytes
+                    emb_f.write(emb.tobytes())
+                    emb_f.flush()
+                    entry = {"text": text, "offset": offset, "length": n, "dim": emb.shape[1],
+                             "idf": idf[i, :n].tolist()}
+                    index_f.write(json.dumps(entry) + "\n")
+                    self.index[text] = entry
+                    self.fresh[text] = emb
+
+    def _padded(self, texts):
+        import torch
+        from torch.nn.utils.rnn import pad_sequence
+
+        # Same padding as bert_score.utils.bert_cos_score_idf; copies, because
+        # greedy_cos_idf normalizes its inputs in place.
+        emb = [torch.tensor(np.asarray(self._embedding(t)), device=self.scorer.device) for t in texts]
+        idf = [torch.tensor(self.index[t]["idf"], device=self.scorer.device) for t in texts]
+        lens = torch.tensor([e.size(0) for e in emb], device=self.scorer.device)
+        mask = torch.arange(int(lens.max()), device=self.scorer.device)[None, :] < lens[:, None]
+        return pad_sequence(emb, batch_first=True, padding_value=2.0), mask, pad_sequence(idf, batch_first=True)
+
+    def score(self, hyps, refs):
+        # Returns (P, R, F) arrays aligned with the inputs, rescaled like bert_score.score.
+        import torch
+        from bert_score.utils import greedy_cos_idf
+
+        pairs = list(zip(hyps, refs))
+        todo = [pair for pair in dict.fromkeys(pairs) if pair not in self.pairs]
+        if todo:
+            missing = {text for pair in todo for text in pair if text not in self.index}
+            if missing:
+                self._embed(sorted(missing))
+            todo.sort(key=lambda pair: max(self.index[pair[0]]["length"], self.index[pair[1]]["length"]))
+            with open(self.pairs_path, "a") as f, torch.no_grad():
+                for batch in iter_batches(todo, self.batch_size):
+                    P, R, F = greedy_cos_idf(
+                        *self._padded([ref for _, ref in batch]), *self._padded([hyp for hyp, _ in batch])
+                    )
+                    for (hyp, ref), prf in zip(batch, torch.stack((P, R, F), dim=-1).cpu().tolist()):
+                        self.pairs[(hyp, ref)] = prf
+                        f.write(json.dumps({"hyp": hyp, "ref": ref, "prf": prf}) + "\n")
+
+        scores = np.array([self.pairs[pair] for pair in pairs], dtype=np.float32).reshape(-1, 3)
+        if self.scorer.rescale_with_baseline:
+            baseline = self.scorer.baseline_vals.numpy()
+            scores = (scores - baseline) / (1 - baseline)
+        return scores[:, 0], scores[:, 1], scores[:, 2]
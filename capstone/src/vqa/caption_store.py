@@ -0,0 +1,85 @@
+# caption_store.py
+# Agam Grewal – Capstone: Persistent caption store keyed by image content hash
+#
+# A caption is stored under (sha256 of the image bytes, model name, generation
+# params), so re-running the captioner only touches new or changed images.
+# Content hashes come from the image directory's manifest (image_index.py).
+
+import os
+import json
+
+from .data import CAPTION_FILE, load_captions
+from .models import CAPTION_MODEL
+from .image_index import load_image_index
+
+STORE_DIR = "src/data/cache/captions"
+CAPTIONS_FILE = "captions.jsonl"
+CAPTION_PARAMS = {"max_new_tokens": 20}
+
+
+def caption_key(image_sha, model_name, params):
+    return f"{image_sha}|{model_name}|{json.dumps(params, sort_keys=True)}"
+
+
+def _read_jsonl(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.endswith("\n")]
+
+
+def _append(path, record):
+    with open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+class CaptionStore:
+    def __init__(self, store_dir=STORE_DIR):
+        os.makedirs(store_dir, exist_ok=True)
+        self.captions_path = os.path.join(store_dir, CAPTIONS_FILE)
+        self.captions = {r["key"]: r["caption"] for r in _read_jsonl(self.captions_path)}
+
+    def get(self, image_sha, model_name, params):
+        return self.captions.get(caption_key(image_sha, model_name, params))
+
+    def put(self, image_sha, model_name, params, caption):
+        key = caption_key(image_sha, model_name, params)
+        self.captions[key] = caption
+        _append(self.captions_path, {"key": key, "caption": caption})
+
+    def captions_for(self, image_dir, model_name, params, legacy_file=CAPTION_FILE):
+        # {image_id: caption} for every image in image_dir that has a stored caption.
+        # The legacy captions JSONL was written with the default model and params, so for
+        # those its captions are imported on first use; without the image directory the
+        # legacy file is all there is to read.
+        has_legacy = (bool(legacy_file) and os.path.exists(legacy_file)
+                      and model_name == CAPTION_MODEL and params == CAPTION_PARAMS)
+        if not os.path.isdir(image_dir):
+            return load_captions(legacy_file) if has_legacy else {}
+        legacy = {r["image_id"]: r["caption"] for r in _read_jsonl(legacy_file)} if has_legacy else {}
+
+        captions = {}
+        for entry in load_image_index(image_dir).entries():
+            image_sha = entry["sha256"]
+            caption = self.get(image_sha, model_name, params)
+            if caption is None and entry["fname"] in legacy:
+                caption = legacy[entry["fname"]]
+                self.put(image_sha, model_name, params, caption)
+            if caption is not None:
+                captions[entry["image_id"]] = caption
+        return captions
+
+    def export(self, image_dir, model_name, params, output_file):
+        # Writes the captions_sample5000.jsonl format for the images currently in image_dir.
+        count = 0
+        with open(output_file, "w") as f:
+            for image_id, caption in sorted(self.captions_for(image_dir, model_name, params, None).items()):
+                f.write(json.dumps({"image_id": f"{image_id:012d}.jpg", "caption": caption}) + "\n")
+                count += 1
+        return count
+
+
+def load_store_captions(image_dir, model_name=CAPTION_MODEL, params=None, store_dir=STORE_DIR,
+                        legacy_file=CAPTION_FILE):
+    # What the caption run and the evaluation scripts read instead of parsing the JSONL.
+    return CaptionStore(store_dir).captions_for(image_dir, model_name, params or CAPTION_PARAMS, legacy_file)
@@ -0,0 +1,96 @@
+# captioning.py
+# Agam Grewal – Capstone: BLIP caption generation for the image sample
+
+import os
+import time
+from tqdm import tqdm
+
+from .data import IMAGE_DIR, CAPTION_FILE, PIXEL_CACHE_DIR, RESULTS_DIR, iter_batches
+from .models import CAPTION_MODEL, default_device, load_processor, load_caption_model
+from .loader import prefetch_images
+from .pixel_cache import load_or_build_pixel_cache
+from .caption_store import STORE_DIR, CaptionStore
+from .image_index import load_image_index
+from .metrics import StageTimer, ResourceSampler, timed_iter, write_metrics
+
+
+def generate_captions(image_dir=IMAGE_DIR, output_file=CAPTION_FILE, model_name=CAPTION_MODEL, device=None,
+                      num_workers=4, use_processes=False, pixel_cache_dir=PIXEL_CACHE_DIR, max_new_tokens=20,
+                      store_dir=STORE_DIR, batch_size=16, results_dir=RESULTS_DIR):
+    # Only images without a stored caption for (content hash, model, params) are
+    # captioned, batch_size images per generate call, and each batch is appended to
+    # the store as it finishes; output_file is then rewritten from the store.
+    # Timings go to <results_dir>/captioning_metrics.json, next to the runs' metrics.
+    params = {"max_new_tokens": max_new_tokens}
+    store = CaptionStore(store_dir)
+    done = store.captions_for(image_dir, model_name, params)
+    index = load_image_index(image_dir)
+    todo = [image_id for image_id in index.ids() if image_id not in done]
+    print(f"{len(done)} captions already stored, {len(todo)} images to caption")
+
+    if todo:
+        import torch
+        from .engine import stack_pixels
+
+        device = device or default_device()
+        processor = load_processor(model_name)
+        model = load_caption_model(model_name, device)
+        paths = ((image_id, index.path(image_id)) for image_id in todo)
+        timer = StageTimer()
+
+        if pixel_cache_dir:
+            pixel_cache = load_or_build_pixel_cache(
+                pixel_cache_dir, image_dir, processor.image_processor, num_workers=num_workers, use_processes=use_processes
+            )
+            loaded = pixel_cache.prefetch(paths)
+        else:
+            loaded = prefetch_images(paths, processor.image_processor, num_workers, use_processes, timer=timer)
+
+        def ready(pbar):
+            for image_id, pixels, error in timed_iter(loaded, timer, "load_wait"):
+                pbar.update(1)
+                if pixels is None:
+                    print(f"Error processing {image_id}: {error or 'file not found'}")
+                    continue
+                yield image_id, pixels
+
+        # BLIP resizes every image to the same shape, so a batch needs no pixel padding;
+        # generate() pads finished captions and stops once every caption has hit [SEP].
+        start, captioned = time.perf_counter(), 0
+        with ResourceSampler() as sampler, tqdm(total=len(todo), desc="Captioning") as pbar:
+            for batch in iter_batches(ready(pbar), batch_size):
+                batch_start = time.perf_counter()
+                try:
+                    with timer.stage("stack"):
+                        pixel_values = stack_pixels([pixels for _, pixels in batch], device)
+                    with timer.stage("generate"), torch.inference_mode():
+                        output = model.generate(pixel_values=pixel_values, max_new_tokens=max_new_tokens)
+                    with timer.stage("decode_text"):
+                        captions = processor.batch_decode(output, skip_special_tokens=True)
+                except Exception as e:
+                    print(f"Error on batch starting at {batch[0][0]}: {e}")
+                    continue
+                timer.add_per_item("per_image", time.perf_counter() - batch_start, len(batch))
+                for (image_id, _), caption in zip(batch, captions):
+                    store.put(index.sha256(image_id), model_name, params, caption)
+                captioned += len(batch)
+                pbar.set_postfix(img_per_s=f"{captioned / (time.perf_counter() - start):.2f}")
+        elapsed = time.perf_counter() - start
+        print(f"Captioned {captioned} images in {elapsed:.1f}s ({captioned / elapsed if elapsed else 0:.2f} images/sec, "
+              f"batch size {batch_size})")
+        metrics_path = os.path.join(results_dir, "captioning_metrics.json")
+        write_metrics(metrics_path, {
+            "model": model_name,
+            "device": device,
+            "batch_size": batch_size,
+            "images": captioned,
+            "wall_sec": round(elapsed, 3),
+            "images_per_sec": round(captioned / elapsed, 3) if elapsed else 0,
+            "stages": timer.summary(),
+            "resources": sampler.summary(),
+        })
+        print(f"Metrics saved to {metrics_path}")
+
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    count = store.export(image_dir, model_name, params, output_file)
+    print(f"\n {count} captions saved to {output_file}")
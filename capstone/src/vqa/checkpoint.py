@@ -0,0 +1,89 @@
+# checkpoint.py
+# Agam Grewal – Capstone: Append-only JSONL prediction checkpoints
+
+import os
+import json
+
+
+def iter_predictions(jsonl_path):
+    # Yields each question_id once; a half-written last line from a crash is ignored.
+    if not os.path.exists(jsonl_path):
+        return
+    seen = set()
+    with open(jsonl_path) as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break
+            record = json.loads(line)
+            if record["question_id"] not in seen:
+                seen.add(record["question_id"])
+                yield record
+
+
+def load_done_ids(jsonl_path):
+    return {record["question_id"] for record in iter_predictions(jsonl_path)}
+
+
+class PredictionWriter:
+    def __init__(self, jsonl_path, flush_every=256, resume=True):
+        self.path = jsonl_path
+        self.flush_every = flush_every
+        self.pending = 0
+        os.makedirs(os.path.dirname(jsonl_path) or ".", exist_ok=True)
+        if resume and os.path.exists(jsonl_path):
+            self._drop_partial_line()
+        self.f = open(jsonl_path, "a" if resume else "w")
+
+    def _drop_partial_line(self):
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def write(self, record):
+        self.f.write(json.dumps(record) + "\n")
+        self.pending += 1
+        if self.pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.pending = 0
+
+    def close(self):
+        self.flush()
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def ordered_predictions(jsonl_path, question_ids):
+    # Checkpoint records in the order of question_ids, then any others in file
+    # order. Holds the records in memory, which is fine at one short answer each.
+    records = {record["question_id"]: record for record in iter_predictions(jsonl_path)}
+    for qid in question_ids:
+        if qid in records:
+            yield records.pop(qid)
+    yield from records.values()
+
+
+def compact_predictions(jsonl_path, output_path, question_ids=None):
+    # Streams the checkpoint into the usual indented JSON list; with question_ids,
+    # the predictions are written in that order instead of checkpoint order.
+    count = 0
+    tmp_path = output_path + ".tmp"
+    records = iter_predictions(jsonl_path) if question_ids is None else ordered_predictions(jsonl_path, question_ids)
+    with open(tmp_path, "w") as out:
+        out.write("[")
+        for record in records:
+            body = json.dumps(record, indent=2).replace("\n", "\n  ")
+            out.write(("," if count else "") + "\n  " + body)
+            count += 1
+        out.write("\n]" if count else "]")
+    os.replace(tmp_path, output_path)
+    return count
@@ -0,0 +1,206 @@
+# cli.py
+# Agam Grewal – Capstone: Command line entry point
+#
+#   python -m src.vqa run --mode baseline|caption [options]
+#   python -m src.vqa captions [options]
+#   python -m src.vqa cache-pixels [options]
+#   python -m src.vqa index-images [--rescan]
+#   python -m src.vqa diff <predictions.json> [<predictions.json> ...] [options]
+#   python -m src.vqa bench [options]
+#   python -m src.vqa bench-compare [baseline] [current]
+#   python -m src.vqa export-onnx [options]
+#   python -m src.vqa serve [options]
+#   python -m src.vqa ask QUESTION --image-id ID [--caption TEXT]
+#
+# Run from the capstone/ directory; default paths are relative to it.
+
+import sys
+import json
+import argparse
+
+from .data import IMAGE_DIR, CAPTION_FILE, PIXEL_CACHE_DIR, RESULTS_DIR, QUESTION_PATH, ANNOTATION_PATH
+from .models import VQA_MODEL, CAPTION_MODEL
+from .caption_store import STORE_DIR
+from .backends import BACKENDS
+from .answer_cache import ANSWER_CACHE_PATH, MAX_ENTRIES
+from .ranking import NUM_CANDIDATES, TOP_K
+from .bench import BENCHMARKS, BASELINE_FILE, LATEST_FILE
+from .server import HOST, PORT
+
+
+def add_image_args(parser):
+    parser.add_argument("--image-dir", default=IMAGE_DIR)
+    parser.add_argument("--num-workers", type=int, default=4, help="image decode/preprocess workers")
+    parser.add_argument("--use-processes", action="store_true", help="decode images in a process pool")
+    parser.add_argument("--pixel-cache-dir", default=PIXEL_CACHE_DIR)
+
+
+def add_model_args(parser, default_model):
+    parser.add_argument("--model", default=default_model)
+    parser.add_argument("--device", default=None, help="defaults to cuda when available, else cpu")
+    parser.add_argument("--no-pixel-cache", action="store_true", help="decode JPEGs instead of the pixel cache")
+    add_image_args(parser)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m src.vqa", description="BLIP-VQA capstone experiments")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="answer the VQA sample and write predictions + accuracy summary")
+    run.add_argument("--mode", choices=["baseline", "caption"], required=True)
+    run.add_argument("--results-dir", default=RESULTS_DIR)
+    run.add_argument("--batch-size", type=int, default=16, help="questions per generate call")
+    run.add_argument("--max-tokens", type=int, default=None,
+                     help="batch by padded prompt tokens instead of --batch-size, shortest prompts first")
+    run.add_argument("--flush-every", type=int, default=256, help="predictions between checkpoint flushes")
+    run.add_argument("--no-resume", action="store_true", help="ignore an existing checkpoint and start over")
+    run.add_argument("--num-shards", type=int, default=1, help="worker processes, each with its own model")
+    run.add_argument("--threads-per-shard", type=int, default=None)
+    run.add_argument("--backend", choices=BACKENDS, default="fp32", help="execution backend, see vqa/backends.py")
+    run.add_argument("--tolerance", type=float, default=0.5, help="accuracy points a backend may lose vs fp32")
+    run.add_argument("--answer-mode", choices=["generate", "rank"], default="generate",
+                     help="free-form generate, or rank a closed vocabulary of frequent answers")
+    run.add_argument("--num-candidates", type=int, default=NUM_CANDIDATES, help="rank mode: answer vocabulary size")
+    run.add_argument("--rank-k", type=int, default=TOP_K, help="rank mode: candidates scored in full per question")
+    run.add_argument("--no-answer-cache", action="store_true", help="generate every answer, even if cached")
+    run.add_argument("--answer-cache-size", type=int, default=MAX_ENTRIES, help="answers kept in the answer cache")
+    add_model_args(run, VQA_MODEL)
+
+    captions = sub.add_parser("captions", help="caption every image in the sample")
+    captions.add_argument("--output", default=CAPTION_FILE)
+    captions.add_argument("--store-dir", default=STORE_DIR, help="caption store keyed by image content hash")
+    captions.add_argument("--max-new-tokens", type=int, default=20)
+    captions.add_argument("--batch-size", type=int, default=16, help="images per generate call")
+    captions.add_argument("--results-dir", default=RESULTS_DIR, help="where captioning_metrics.json is written")
+    add_model_args(captions, CAPTION_MODEL)
+
+    cache = sub.add_parser("cache-pixels", help="build the memory-mapped pixel tensor cache")
+    cache.add_argument("--model", default=VQA_MODEL, help="model whose image processor defines the tensors")
+    add_image_args(cache)
+
+    index = sub.add_parser("index-images", help="build or refresh the image directory manifest")
+    index.add_argument("--image-dir", default=IMAGE_DIR)
+    index.add_argument("--rescan", action="store_true", help="re-stat every file, e.g. after in-place edits")
+
+    diff = sub.add_parser("diff", help="compare prediction files question by question")
+    diff.add_argument("predictions", nargs="+", help="<run>_predictions.json files")
+    diff.add_argument("--questions", default=QUESTION_PATH)
+    diff.add_argument("--annotations", default=ANNOTATION_PATH)
+    diff.add_argument("--metric", choices=["strict", "any_match"], default="strict")
+    diff.add_argument("--output", help="write counts, agreement and question ids per category as JSON")
+    diff.add_argument("--sample", help="print example questions from this category")
+    diff.add_argument("--k", type=int, default=5)
+    diff.add_argument("--seed", type=int, default=0)
+
+    bench = sub.add_parser("bench", help="benchmark the decode, generate and scoring hot paths")
+    bench.add_argument("--output", default=LATEST_FILE)
+    bench.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="run just these benchmarks")
+    bench.add_argument("--repeat", type=int, default=10, help="timed iterations per benchmark")
+    bench.add_argument("--warmup", type=int, default=2)
+
+    bench_compare = sub.add_parser("bench-compare", help="flag regressions against a saved benchmark baseline")
+    bench_compare.add_argument("baseline", nargs="?", default=BASELINE_FILE)
+    bench_compare.add_argument("current", nargs="?", default=LATEST_FILE)
+    bench_compare.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown as a fraction")
+
+    export = sub.add_parser("export-onnx", help="export BLIP-VQA to ONNX and check it against PyTorch")
+    export.add_argument("--model", default=VQA_MODEL)
+    export.add_argument("--output-dir", default=None, help="defaults to src/data/cache/onnx/<model>")
+    export.add_argument("--opset", type=int, default=17)
+    export.add_argument("--repeat", type=int, default=5, help="timed iterations in the throughput comparison")
+
+    serve = sub.add_parser("serve", help="answer questions over HTTP with a resident model")
+    serve.add_argument("--model", default=VQA_MODEL)
+    serve.add_argument("--device", default=None, help="defaults to cuda when available, else cpu")
+    serve.add_argument("--backend", choices=BACKENDS, default="fp32")
+    serve.add_argument("--image-dir", default=IMAGE_DIR, help="where image_id requests are looked up")
+    serve.add_argument("--host", default=HOST)
+    serve.add_argument("--port", type=int, default=PORT)
+    serve.add_argument("--max-batch", type=int, default=16, help="requests per generate call")
+    serve.add_argument("--max-wait-ms", type=float, default=10, help="how long a request waits for others to batch with")
+    serve.add_argument("--decode-workers", type=int, default=4, help="threads decoding request images")
+
+    ask = sub.add_parser("ask", help="send one question to a running server")
+    ask.add_argument("question")
+    target = ask.add_mutually_exclusive_group(required=True)
+    target.add_argument("--image-id", type=int)
+    target.add_argument("--image-path")
+    ask.add_argument("--caption", default=None)
+    ask.add_argument("--url", default=f"http://{HOST}:{PORT}")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.command == "run":
+        from .runner import RunConfig, run_inference
+        run_inference(RunConfig(
+            mode=args.mode,
+            model_name=args.model,
+            image_dir=args.image_dir,
+            results_dir=args.results_dir,
+            device=args.device,
+            batch_size=args.batch_size,
+            max_tokens=args.max_tokens,
+            num_workers=args.num_workers,
+            use_processes=args.use_processes,
+            pixel_cache_dir=None if args.no_pixel_cache else args.pixel_cache_dir,
+            flush_every=args.flush_every,
+            resume=not args.no_resume,
+            num_shards=args.num_shards,
+            threads_per_shard=args.threads_per_shard,
+            backend=args.backend,
+            tolerance=args.tolerance,
+            answer_cache_path=None if args.no_answer_cache else ANSWER_CACHE_PATH,
+            answer_cache_size=args.answer_cache_size,
+            answer_mode=args.answer_mode,
+            num_candidates=args.num_candidates,
+            rank_k=args.rank_k,
+        ))
+    elif args.command == "captions":
+        from .captioning import generate_captions
+        generate_captions(
+            args.image_dir, args.output, args.model, args.device,
+            args.num_workers, args.use_processes, None if args.no_pixel_cache else args.pixel_cache_dir,
+            args.max_new_tokens, args.store_dir, args.batch_size, args.results_dir,
+        )
+    elif args.command == "cache-pixels":
+        from .models import load_processor
+        from .pixel_cache import load_or_build_pixel_cache
+        processor = load_processor(args.model)
+        cache = load_or_build_pixel_cache(
+            args.pixel_cache_dir, args.image_dir, processor.image_processor, num_workers=args.num_workers,
+            use_processes=args.use_processes,
+        )
+        print(f"Cached {len(cache.offsets)} images in {args.pixel_cache_dir} ({len(cache.errors)} failed)")
+    elif args.command == "index-images":
+        from .image_index import load_image_index
+        index = load_image_index(args.image_dir, rescan=args.rescan)
+        print(f"{len(index)} images indexed in {index.manifest_path}")
+    elif args.command == "diff":
+        from .rundiff import diff_runs
+        diff_runs(args.predictions, args.questions, args.annotations, args.metric, args.output,
+                  args.sample, args.k, args.seed)
+    elif args.command == "bench":
+        from .bench import run_benchmarks
+        run_benchmarks(args.output, args.only, args.repeat, args.warmup)
+    elif args.command == "bench-compare":
+        from .bench import compare
+        sys.exit(1 if compare(args.baseline, args.current, args.threshold) else 0)
+    elif args.command == "export-onnx":
+        from .onnx_backend import export_and_check
+        export_and_check(args.model, args.output_dir, args.opset, args.repeat)
+    elif args.command == "serve":
+        from .server import serve
+        serve(
+            args.model, args.host, args.port, args.device, args.backend, args.image_dir,
+            args.max_batch, args.max_wait_ms, args.decode_workers,
+        )
+    elif args.command == "ask":
+        from .server import ask
+        print(json.dumps(ask(args.question, args.image_id, args.image_path, args.caption, args.url), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# data.py
+# Agam Grewal – Capstone: Question/answer/caption loading shared by the inference runs
+# Kept free of torch/transformers imports so tooling can use it cheaply.
+
+import os
+import json
+from itertools import islice
+
+IMAGE_DIR = "src/data/sample5000"
+QUESTION_PATH = "src/data/annotations/vqa_train_sample5000_questions.json"
+ANNOTATION_PATH = "src/data/annotations/vqa_train_sample5000_annotations.json"
+CAPTION_FILE = "src/data/annotations/captions_sample5000.jsonl"
+PIXEL_CACHE_DIR = "src/data/cache/sample5000_pixels"
+RESULTS_DIR = "results"
+
+
+def image_path(image_dir, image_id):
+    return os.path.join(image_dir, f"{image_id:012d}.jpg")
+
+
+def load_captions(caption_file):
+    captions = {}
+    with open(caption_file) as f:
+        for line in f:
+            entry = json.loads(line)
+            image_id = int(os.path.splitext(entry["image_id"])[0])
+            captions[image_id] = entry["caption"]
+    return captions
+
+
+def load_merged(question_path, annotation_path, captions=None):
+    # One dict per answered question; "caption" is only added when captions are given.
+    from .annotations import load_annotation_store
+    return load_annotation_store(question_path, annotation_path).merged_items(captions)
+
+
+def build_baseline_text(item):
+    return item["question"]
+
+
+def build_caption_text(item):
+    return f"Caption: {item['caption']} Question: {item['question']}"
+
+
+PROMPT_BUILDERS = {
+    "baseline": build_baseline_text,
+    "caption": build_caption_text,
+}
+
+
+def iter_batches(items, batch_size):
+    # Works on any iterable, so batches can be cut from a prefetching generator.
+    it = iter(items)
+    while batch := list(islice(it, batch_size)):
+        yield batch
+
+
+def group_by_image(items):
+    groups = {}
+    for item in items:
+        groups.setdefault(item["image_id"], []).append(item)
+    return list(groups.items())
+
+
+def iter_group_batches(groups, batch_size):
+    # Packs whole (key, items) groups until the batch holds batch_size questions;
+    # a group larger than batch_size gets a batch of its own.
+    batch, count = [], 0
+    for key, items in groups:
+        if batch and count + len(items) > batch_size:
+            yield batch
+            batch, count = [], 0
+        batch.append((key, items))
+        count += len(items)
+    if batch:
+        yield batch
+
+
+def iter_token_batches(groups, max_tokens, length):
+    # Like iter_group_batches, but the budget is padded tokens: questions in the
+    # batch times the longest of them, with length(items) giving a group's longest
+    # tokenized prompt. Fed groups sorted by length, batches grow as prompts shrink.
+    batch, count, longest = [], 0, 0
+    for key, items in groups:
+        group_longest = length(items)
+        if batch and (count + len(items)) * max(longest, group_longest) > max_tokens:
+            yield batch
+            batch, count, longest = [], 0, 0
+        batch.append((key, items))
+        count += len(items)
+        longest = max(longest, group_longest)
+    if batch:
+        yield batch
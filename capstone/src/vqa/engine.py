@@ -0,0 +1,173 @@
+# engine.py
+# Agam Grewal – Capstone: Batched BLIP-VQA inference
+
+import time
+
+import numpy as np
+from tqdm import tqdm
+import torch
+
+from .data import group_by_image, iter_group_batches, iter_token_batches
+from .image_index import load_image_index
+from .loader import prefetch_images
+from .backends import inference_context
+from .metrics import StageTimer, timed_iter
+
+
+def encode_questions(model, image_embeds, input_ids, attention_mask):
+    image_attention_mask = torch.ones(image_embeds.size()[:-1], dtype=torch.long, device=image_embeds.device)
+    return model.text_encoder(
+        input_ids=input_ids,
+        attention_mask=attention_mask,
+        encoder_hidden_states=image_embeds,
+        encoder_attention_mask=image_attention_mask,
+        return_dict=False,
+    )[0]
+
+
+def generate_from_image_embeds(model, image_embeds, input_ids, attention_mask, max_new_tokens=10):
+    # Same steps as BlipForQuestionAnswering.generate, except that the question
+    # padding mask is passed on to the answer decoder. The stock implementation
+    # uses an all-ones mask there, so padded questions in a batch would
+    # cross-attend to [PAD] tokens and answer differently from the per-item path.
+    question_embeds = encode_questions(model, image_embeds, input_ids, attention_mask)
+    bos_ids = torch.full(
+        (question_embeds.size(0), 1), fill_value=model.decoder_start_token_id, device=question_embeds.device
+    )
+    return model.text_decoder.generate(
+        input_ids=bos_ids,
+        eos_token_id=model.config.text_config.sep_token_id,
+        pad_token_id=model.config.text_config.pad_token_id,
+        encoder_hidden_states=question_embeds,
+        encoder_attention_mask=attention_mask,
+        max_new_tokens=max_new_tokens,
+    )
+
+
+def stack_pixels(pixel_arrays, device):
+    # Cached pixels may be stored as float16; the model always sees float32.
+    return torch.from_numpy(np.stack(pixel_arrays)).to(device=device, dtype=torch.float32)
+
+
+def answer_image_groups(model, processor, pixel_values, texts_per_image, device, max_new_tokens=10, backend="fp32",
+                        timer=None, candidates=None):
+    # The vision encoder runs once per image and its embeddings are repeated
+    # for every question about that image before the text encoder/decoder.
+    # With candidates (a ranking.Candidates on device), answers are ranked from
+    # that closed vocabulary instead of generated. An onnx_backend.OnnxBlipVQA
+    # model runs the same steps on ONNX Runtime.
+    timer = timer or StageTimer()
+    texts = [text for texts in texts_per_image for text in texts]
+    with timer.stage("tokenize"):
+        counts = torch.tensor([len(texts) for texts in texts_per_image], device=device)
+        text_inputs = processor(text=texts, padding="longest", return_tensors="pt").to(device)
+        timer.count("real_tokens", int(text_inputs["attention_mask"].sum()))
+        timer.count("padded_tokens", text_inputs["attention_mask"].numel())
+    if getattr(model, "is_onnx", False):
+        with timer.stage("generate"):
+            output = model.generate(
+                pixel_values.cpu().numpy(), counts.cpu().numpy(), text_inputs["input_ids"].cpu().numpy(),
+                text_inputs["attention_mask"].cpu().numpy(), max_new_tokens,
+            )
+        with timer.stage("decode_text"):
+            return processor.batch_decode(output, skip_special_tokens=True)
+    with timer.stage("generate"), inference_context(backend, device):
+        image_embeds = model.vision_model(pixel_values=pixel_values)[0]
+        image_embeds = image_embeds.repeat_interleave(counts, dim=0)
+        if candidates is not None:
+            from .ranking import rank_answers
+
+            question_embeds = encode_questions(
+                model, image_embeds, text_inputs["input_ids"], text_inputs["attention_mask"]
+            )
+            best = rank_answers(model, question_embeds, text_inputs["attention_mask"], candidates)
+            return [candidates.answers[i] for i in best]
+        output = generate_from_image_embeds(
+            model, image_embeds, text_inputs["input_ids"], text_inputs["attention_mask"], max_new_tokens
+        )
+    with timer.stage("decode_text"):
+        return processor.batch_decode(output, skip_special_tokens=True)
+
+
+def answer_batch(model, processor, images, questions, device, max_new_tokens=10, backend="fp32"):
+    # Questions are padded to the longest item in the batch; one generate call per batch.
+    pixel_values = processor(images=images, return_tensors="pt")["pixel_values"].to(device)
+    return answer_image_groups(
+        model, processor, pixel_values, [[q] for q in questions], device, max_new_tokens, backend
+    )
+
+
+def token_lengths(tokenizer, texts):
+    # Tokenized length of each prompt, special tokens included, as padding="longest" sees it.
+    return [len(ids) for ids in tokenizer(texts)["input_ids"]]
+
+
+def run_grouped_inference(model, processor, items, image_dir, device, build_text, write, batch_size=16,
+                          num_workers=4, use_processes=False, pixel_cache=None, desc="Running BLIP-VQA",
+                          backend="fp32", timer=None, max_tokens=None, max_new_tokens=10, candidates=None):
+    # Calls write(record) for each prediction as its batch finishes, so nothing
+    # accumulates in memory; returns the number of questions with missing images.
+    # With a pixel_cache, preprocessed tensors are read from it instead of the JPEGs.
+    # Stage times go to timer; "per_question" is each batch's time split over its questions.
+    # With max_tokens, image groups are processed shortest prompt first and batched
+    # by padded token count instead of batch_size, so records are written out of
+    # item order; callers that need item order reorder by question_id afterwards.
+    timer = timer or StageTimer()
+    groups = dict(group_by_image(items))
+    order = list(groups)
+    if max_tokens:
+        with timer.stage("schedule"):
+            lengths = dict(zip(
+                (item["question_id"] for item in items),
+                token_lengths(processor.tokenizer, [build_text(item) for item in items]),
+            ))
+            order.sort(key=lambda image_id: max(lengths[item["question_id"]] for item in groups[image_id]))
+    index = load_image_index(image_dir)
+    paths = ((image_id, index.path(image_id)) for image_id in order)
+    missing = 0
+
+    def loaded_groups(pbar):
+        nonlocal missing
+        if pixel_cache is not None:
+            loaded = pixel_cache.prefetch(paths)
+        else:
+            loaded = prefetch_images(paths, processor.image_processor, num_workers, use_processes, timer=timer)
+        for image_id, pixels, error in timed_iter(loaded, timer, "load_wait"):
+            group = groups[image_id]
+            pbar.update(len(group))
+            if pixels is None:
+                if error is None:
+                    missing += len(group)
+                else:
+                    print(f"Error on {image_id}: {error}")
+                continue
+            yield pixels, group
+
+    with tqdm(total=len(items), desc=desc) as pbar:
+        if max_tokens:
+            batches = iter_token_batches(
+                loaded_groups(pbar), max_tokens, lambda group: max(lengths[item["question_id"]] for item in group)
+            )
+        else:
+            batches = iter_group_batches(loaded_groups(pbar), batch_size)
+        for batch in batches:
+            ready = [group for _, group in batch]
+            start = time.perf_counter()
+            try:
+                with timer.stage("stack"):
+                    pixel_values = stack_pixels([pixels for pixels, _ in batch], device)
+                preds = answer_image_groups(
+                    model, processor, pixel_values, [[build_text(item) for item in group] for group in ready], device,
+                    max_new_tokens=max_new_tokens, backend=backend, timer=timer, candidates=candidates,
+                )
+            except Exception as e:
+                print(f"Error on batch starting at {ready[0][0]['image_id']}: {e}")
+                continue
+            flat = [item for group in ready for item in group]
+            elapsed = time.perf_counter() - start
+            timer.add("batch", elapsed)
+            timer.add_per_item("per_question", elapsed, len(flat))
+            for item, pred in zip(flat, preds):
+                write({"question_id": item["question_id"], "answer": pred})
+
+    return missing
@@ -0,0 +1,162 @@
+# figures.py
+# Agam Grewal – Capstone: Incremental, parallel figure rendering
+#
+# A figure is a FigureJob: a module-level render function, the output path and
+# the (JSON-serializable) statistics it plots. Its fingerprint covers those
+# statistics, the render function and the source file defining it, so a figure
+# is only re-rendered when its data or its plotting code changed. Outstanding
+# figures are drawn in worker processes on the Agg backend. The evaluators'
+# own charts are defined at the bottom.
+
+import os
+import json
+import hashlib
+import inspect
+import multiprocessing
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+FIGURE_MANIFEST = "src/data/cache/figures.json"
+DPI = 300
+
+
+@dataclass
+class FigureJob:
+    render: object  # render(data, output); module-level so worker processes can unpickle it
+    output: str
+    data: dict = field(default_factory=dict)
+
+
+def _source_hash(render):
+    try:
+        with open(inspect.getsourcefile(render), "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except (OSError, TypeError):
+        return ""
+
+
+def figure_fingerprint(job):
+    h = hashlib.sha256()
+    h.update(f"{job.render.__module__}.{job.render.__qualname__}\n".encode())
+    h.update(_source_hash(job.render).encode())
+    h.update(json.dumps(job.data, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def _load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_manifest(path, manifest):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _init_worker():
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+
+def _render(job):
+    os.makedirs(os.path.dirname(job.output) or ".", exist_ok=True)
+    job.render(job.data, job.output)
+    return job.output
+
+
+def render_figures(jobs, workers=None, force=False, manifest_path=FIGURE_MANIFEST):
+    # Returns (rendered, skipped) output paths. A figure that fails to render is
+    # reported and left out of the manifest, so the next call retries it.
+    manifest = _load_manifest(manifest_path)
+    todo, skipped = [], []
+    for job in jobs:
+        fingerprint = figure_fingerprint(job)
+        key = os.path.abspath(job.output)
+        if not force and manifest.get(key) == fingerprint and os.path.exists(job.output):
+            skipped.append(job.output)
+        else:
+            todo.append((job, key, fingerprint))
+
+    rendered = []
+    if todo:
+        workers = min(len(todo), workers or os.cpu_count() or 1)
+        if workers == 1:
+            # Not worth a process pool; draw here on Agg.
+            _init_worker()
+            results = []
+            for job, key, fingerprint in todo:
+                try:
+                    results.append((key, fingerprint, _render(job), None))
+                except Exception as e:
+                    results.append((key, fingerprint, job.output, e))
+        else:
+            # fork where available: the evaluators are flat scripts that must not be
+            # re-executed by a spawn/forkserver worker importing __main__.
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("fork" if "fork" in methods else None)
+            with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker) as pool:
+                futures = {pool.submit(_render, job): (job, key, fingerprint) for job, key, fingerprint in todo}
+                results = []
+                for future in as_completed(futures):
+                    job, key, fingerprint = futures[future]
+                    results.append((key, fingerprint, job.output, future.exception()))
+        for key, fingerprint, output, error in results:
+            if error is not None:
+                print(f"Error rendering {output}: {error}")
+                continue
+            manifest[key] = fingerprint
+            rendered.append(output)
+        _save_manifest(manifest_path, manifest)
+
+    print(f"Figures: {len(rendered)} rendered, {len(skipped)} unchanged")
+    return rendered, skipped
+
+
+# -- evaluator charts ---------------------------------------------------
+
+def plot_accuracy_bars(data, output):
+    # data: labels, values, title, color, figsize and optional title_bold,
+    # rotation, grid and sort (descending by value).
+    import matplotlib.pyplot as plt
+
+    labels, values = data["labels"], data["values"]
+    if data.get("sort"):
+        pairs = sorted(zip(labels, values), key=lambda x: x[1], reverse=True)
+        labels, values = [p[0] for p in pairs], [p[1] for p in pairs]
+    plt.figure(figsize=data["figsize"])
+    plt.bar(labels, values, color=data["color"], **({"width": 0.6} if data.get("sort") else {}))
+    if data.get("title_bold"):
+        plt.title(data["title"], fontsize=14, fontweight="bold")
+    else:
+        plt.title(data["title"])
+    plt.ylabel("Accuracy (%)")
+    plt.xlabel("Question Type")
+    if data.get("rotation"):
+        plt.xticks(rotation=data["rotation"], ha="right")
+    if data.get("grid"):
+        plt.grid(axis="y", linestyle="--", alpha=0.7)
+    plt.tight_layout()
+    plt.savefig(output, dpi=DPI)
+    plt.close()
+
+
+def plot_metrics_table(data, output):
+    # data: rows ([metric, value] pairs) and title.
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(6, 3))
+    ax.axis("off")
+    table = ax.table(cellText=data["rows"], colLabels=["Metric", "Value"], loc="center", cellLoc="center")
+    table.auto_set_font_size(False)
+    table.set_fontsize(9)
+    table.scale(1.1, 1.2)
+    plt.title(data["title"], fontsize=11, pad=10)
+    plt.tight_layout()
+    plt.savefig(output, dpi=DPI)
+    plt.close()
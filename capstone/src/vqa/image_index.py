@@ -0,0 +1,132 @@
+# image_index.py
+# Agam Grewal – Capstone: Manifest of the image directory
+#
+# One manifest per image directory records each image's id, file name, size,
+# mtime and sha256. Scripts resolve image ids, paths and content hashes through
+# the in-memory index instead of calling os.path.exists / os.listdir per item.
+# On load only the directory itself is stat'ed: if its mtime is unchanged (no
+# files added, removed or renamed) the manifest is used as is; otherwise the
+# directory is scanned once and only new or changed files are re-hashed.
+# rescan=True also re-stats every file, for images rewritten in place.
+
+import os
+import re
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+MANIFEST_DIR = "src/data/cache/manifests"
+IMAGE_NAME = re.compile(r"(\d{6,12})\.jpe?g$")
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def manifest_path_for(image_dir, manifest_dir=MANIFEST_DIR):
+    path = os.path.abspath(image_dir)
+    digest = hashlib.sha1(path.encode()).hexdigest()[:8]
+    return os.path.join(manifest_dir, f"{os.path.basename(path)}_{digest}.json")
+
+
+class ImageIndex:
+    def __init__(self, image_dir, manifest_path=None, hash_workers=8):
+        self.dir = image_dir
+        self.manifest_path = manifest_path or manifest_path_for(image_dir)
+        self.hash_workers = hash_workers
+        self.dir_mtime_ns = None
+        self.by_id = {}  # image_id -> {"image_id", "fname", "size", "mtime_ns", "sha256"}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            self.dir_mtime_ns = manifest["dir_mtime_ns"]
+            self.by_id = {entry["image_id"]: entry for entry in manifest["images"]}
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __contains__(self, image_id):
+        return image_id in self.by_id
+
+    def ids(self):
+        return sorted(self.by_id)
+
+    def entries(self):
+        return [self.by_id[image_id] for image_id in self.ids()]
+
+    def path(self, image_id):
+        # None if the image is not in the directory.
+        entry = self.by_id.get(image_id)
+        return None if entry is None else os.path.join(self.dir, entry["fname"])
+
+    def sha256(self, image_id):
+        entry = self.by_id.get(image_id)
+        return None if entry is None else entry["sha256"]
+
+    def refresh(self, rescan=False):
+        # Returns the number of images added, changed or removed since the manifest.
+        try:
+            dir_mtime_ns = os.stat(self.dir).st_mtime_ns
+        except FileNotFoundError:
+            changed = len(self.by_id)
+            self.by_id, self.dir_mtime_ns = {}, None
+            return changed
+        if dir_mtime_ns == self.dir_mtime_ns and not rescan:
+            return 0
+
+        known = {entry["fname"]: entry for entry in self.by_id.values()}
+        current, to_hash = {}, []
+        with os.scandir(self.dir) as it:
+            for dirent in it:
+                match = IMAGE_NAME.search(dirent.name)
+                if not match or not dirent.is_file():
+                    continue
+                st = dirent.stat()
+                entry = known.get(dirent.name)
+                if entry is None or entry["size"] != st.st_size or entry["mtime_ns"] != st.st_mtime_ns:
+                    entry = {"image_id": int(match.group(1)), "fname": dirent.name, "size": st.st_size,
+                             "mtime_ns": st.st_mtime_ns, "sha256": None}
+                    to_hash.append(entry)
+                current[entry["image_id"]] = entry
+
+        # Hashing is I/O plus hashlib, which releases the GIL, so threads help.
+        with ThreadPoolExecutor(self.hash_workers) as pool:
+            hashes = pool.map(file_sha256, [os.path.join(self.dir, entry["fname"]) for entry in to_hash])
+            for entry, sha in zip(to_hash, hashes):
+                entry["sha256"] = sha
+
+        changed = len(to_hash) + len(self.by_id.keys() - current.keys())
+        self.by_id, self.dir_mtime_ns = current, dir_mtime_ns
+        self.save()
+        return changed
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"dir": os.path.abspath(self.dir), "dir_mtime_ns": self.dir_mtime_ns,
+                       "images": self.entries()}, f)
+        os.replace(tmp, self.manifest_path)
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def load_image_index(image_dir, rescan=False):
+    # One index per directory per process, refreshed on each call (a single stat
+    # unless the directory changed). Locked for the server's decode threads.
+    key = os.path.abspath(image_dir)
+    with _lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = ImageIndex(image_dir)
+        changed = index.refresh(rescan)
+    if changed:
+        print(f"Image manifest for {image_dir}: {changed} images added, changed or removed ({len(index)} total)")
+    return index
@@ -0,0 +1,93 @@
+# jsonstream.py
+# Agam Grewal – Capstone: Incremental reader for the VQA questions/annotations JSON
+#
+# The full VQA v2 files are single JSON documents of several hundred MB, and
+# json.load keeps the whole thing (plus every dict in it) in memory. Here the
+# file is read in chunks and the records of one top-level array are decoded
+# one at a time with the stdlib decoder, so memory stays at one chunk plus one
+# record no matter how large the file is.
+
+import json
+
+CHUNK_SIZE = 1 << 20
+_WHITESPACE = " \t\n\r"
+
+
+class _Reader:
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        # Drops the consumed prefix and appends the next chunk; False at end of file.
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        self.eof = not chunk
+        return bool(chunk)
+
+    def peek(self):
+        # Next non-whitespace character, or "" at end of file.
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} at offset {self.pos} of the current chunk, got {self.peek()!r}")
+        self.pos += 1
+
+    def value(self, decoder):
+        # A value only counts as complete once a delimiter follows it, so a
+        # number cut off at a chunk boundary is never decoded early.
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            after = end
+            while after < len(self.buf) and self.buf[after] in _WHITESPACE:
+                after += 1
+            if after < len(self.buf) or self.eof:
+                self.pos = end
+                return value
+            self.fill()
+
+
+def iter_records(path, key, fields=None, chunk_size=CHUNK_SIZE):
+    # Yields the elements of the top-level array `key` (e.g. "questions" or
+    # "annotations"); with `fields`, each record is cut down to those keys.
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as f:
+        reader = _Reader(f, chunk_size)
+        reader.expect("{")
+        while reader.peek() not in ("}", ""):
+            name = reader.value(decoder)
+            reader.expect(":")
+            if name != key:
+                reader.value(decoder)  # info/license/etc. are small
+            else:
+                reader.expect("[")
+                while reader.peek() != "]":
+                    record = reader.value(decoder)
+                    if fields is not None:
+                        record = {k: record[k] for k in fields if k in record}
+                    yield record
+                    if reader.peek() == ",":
+                        reader.pos += 1
+                return
+            if reader.peek() == ",":
+                reader.pos += 1
+    raise KeyError(f"{path} has no top-level {key!r} array")
@@ -0,0 +1,55 @@
+# loader.py
+# Agam Grewal – Capstone: Parallel image decode/preprocess prefetching
+
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from PIL import Image
+
+_image_processor = None
+
+
+def _init_worker(image_processor):
+    global _image_processor
+    _image_processor = image_processor
+
+
+def _load_pixels(img_path):
+    # Returns (pixel_values, error, timings); pixel_values and error are both None
+    # when the file is missing (img_path None: not in the image index). timings
+    # holds the decode/preprocess seconds.
+    if img_path is None:
+        return None, None, {}
+    try:
+        start = time.perf_counter()
+        image = Image.open(img_path).convert("RGB")
+        decoded = time.perf_counter()
+        pixels = _image_processor(image, return_tensors="np")["pixel_values"][0]
+        return pixels, None, {"decode": decoded - start, "preprocess": time.perf_counter() - decoded}
+    except FileNotFoundError:
+        return None, None, {}
+    except Exception as e:
+        return None, str(e), {}
+
+
+def prefetch_images(paths, image_processor, num_workers=4, use_processes=False, max_prefetch=64, timer=None):
+    # paths: iterable of (key, img_path). Yields (key, pixel_values, error) in input
+    # order while up to max_prefetch images are decoded and preprocessed ahead of
+    # the consumer by a thread pool (or a process pool with use_processes=True).
+    # Worker decode/preprocess times are added to timer (a metrics.StageTimer) if given.
+    def result(key, future):
+        pixels, error, timings = future.result()
+        if timer is not None:
+            for stage, seconds in timings.items():
+                timer.add(stage, seconds)
+        return key, pixels, error
+
+    pool_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with pool_cls(max_workers=num_workers, initializer=_init_worker, initargs=(image_processor,)) as pool:
+        pending = deque()
+        for key, img_path in paths:
+            pending.append((key, pool.submit(_load_pixels, img_path)))
+            if len(pending) >= max_prefetch:
+                yield result(*pending.popleft())
+        while pending:
+            yield result(*pending.popleft())
@@ -0,0 +1,153 @@
+# metrics.py
+# Agam Grewal – Capstone: Stage timers, latency percentiles and resource sampling
+#
+# The inference loops record how long each stage takes (image decode and
+# preprocessing in the loader workers, tokenize, generate, decode_text) and a
+# background thread samples CPU, RSS and thread counts of this process and its
+# shard workers. Both end up in <run>_metrics.json next to the predictions.
+
+import os
+import json
+import time
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+
+PERCENTILES = (50, 95, 99)
+
+
+def latency_summary(samples, bins=20):
+    arr = np.asarray(samples, dtype=np.float64) * 1000
+    if not len(arr):
+        return {"count": 0}
+    counts, edges = np.histogram(arr, bins=bins)
+    summary = {"count": len(arr), "total_sec": round(float(arr.sum()) / 1000, 3), "mean_ms": float(arr.mean())}
+    summary.update({f"p{p}_ms": float(v) for p, v in zip(PERCENTILES, np.percentile(arr, PERCENTILES))})
+    summary["max_ms"] = float(arr.max())
+    summary["histogram"] = {"edges_ms": edges.round(3).tolist(), "counts": counts.tolist()}
+    return summary
+
+
+class StageTimer:
+    # Plain dicts of lists, so shard workers can send theirs back to be merged.
+    def __init__(self):
+        self.samples = defaultdict(list)  # stage -> seconds per call
+        self.counters = defaultdict(int)  # e.g. real vs padded prompt tokens
+
+    def count(self, name, value):
+        self.counters[name] += value
+
+    def add(self, stage, seconds):
+        self.samples[stage].append(seconds)
+
+    def add_per_item(self, stage, seconds, count):
+        # A batch's time split evenly over the items it processed.
+        self.samples[stage].extend([seconds / count] * count)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def merge(self, other):
+        for stage, samples in other.samples.items():
+            self.samples[stage].extend(samples)
+        for name, value in other.counters.items():
+            self.counters[name] += value
+        return self
+
+    def summary(self):
+        return {stage: latency_summary(samples) for stage, samples in self.samples.items()}
+
+    def padding_efficiency(self):
+        # Share of the tokens fed to the text encoder that were not padding.
+        padded = self.counters.get("padded_tokens", 0)
+        return round(self.counters.get("real_tokens", 0) / padded, 4) if padded else None
+
+
+def timed_iter(iterable, timer, stage):
+    # Records how long the consumer waits on each item, e.g. a stalled prefetch pipeline.
+    it = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(it)
+        except StopIteration:
+            return
+        timer.add(stage, time.perf_counter() - start)
+        yield item
+
+
+class ResourceSampler:
+    # Samples this process and its children (shard workers) every `interval` seconds.
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.samples = defaultdict(list)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._procs = {}
+
+    def _run(self):
+        import psutil
+
+        root = self._procs.setdefault(os.getpid(), psutil.Process())
+        root.cpu_percent(None)
+        psutil.cpu_percent(None)
+        while True:
+            # One last sample is taken on stop, so even short runs get one.
+            stopped = self._stop.wait(self.interval)
+            self._sample(psutil, root)
+            if stopped:
+                return
+
+    def _sample(self, psutil, root):
+        try:
+            procs = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return
+        cpu = rss = threads = 0
+        for proc in procs:
+            # cpu_percent is measured since the previous call on the same object.
+            proc = self._procs.setdefault(proc.pid, proc)
+            try:
+                cpu += proc.cpu_percent(None)
+                rss += proc.memory_info().rss
+                threads += proc.num_threads()
+            except psutil.Error:
+                continue
+        self.samples["process_cpu_pct"].append(cpu)
+        self.samples["rss_mb"].append(rss / 2 ** 20)
+        self.samples["threads"].append(threads)
+        self.samples["processes"].append(len(procs))
+        self.samples["system_cpu_pct"].append(psutil.cpu_percent(None))
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def summary(self):
+        out = {"interval_sec": self.interval, "samples": len(self.samples.get("rss_mb", ()))}
+        for name, values in self.samples.items():
+            out[name] = {"mean": round(float(np.mean(values)), 2), "max": round(float(np.max(values)), 2)}
+        return out
+
+
+def write_metrics(path, metrics):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(metrics, f, indent=2)
@@ -0,0 +1,51 @@
+# models.py
+# Agam Grewal – Capstone: Lazy BLIP model loading
+# transformers/torch are only imported when a model is actually requested.
+
+VQA_MODEL = "Salesforce/blip-vqa-base"
+CAPTION_MODEL = "Salesforce/blip-image-captioning-base"
+
+
+def default_device():
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def model_revision(model_name):
+    # The hub snapshot (commit hash) the model would load from, without loading it.
+    # Local directories are identified by their files' names, sizes and mtimes;
+    # uncached hub models fall back to the name alone.
+    import os
+    if os.path.isdir(model_name):
+        import hashlib
+        h = hashlib.sha256()
+        for fname in sorted(os.listdir(model_name)):
+            st = os.stat(os.path.join(model_name, fname))
+            h.update(f"{fname}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+        return f"{os.path.abspath(model_name)}@{h.hexdigest()[:12]}"
+    from huggingface_hub import try_to_load_from_cache
+    config_path = try_to_load_from_cache(model_name, "config.json")
+    if isinstance(config_path, str):
+        return f"{model_name}@{os.path.basename(os.path.dirname(config_path))}"
+    return model_name
+
+
+def load_processor(model_name=VQA_MODEL):
+    from transformers import BlipProcessor
+    return BlipProcessor.from_pretrained(model_name)
+
+
+def load_vqa_model(model_name=VQA_MODEL, device="cpu"):
+    from transformers import BlipForQuestionAnswering
+    print(f"Loading BLIP VQA model on {device}...")
+    model = BlipForQuestionAnswering.from_pretrained(model_name).to(device)
+    model.eval()
+    return model
+
+
+def load_caption_model(model_name=CAPTION_MODEL, device="cpu"):
+    from transformers import BlipForConditionalGeneration
+    print(f"Loading BLIP captioning model on {device}...")
+    model = BlipForConditionalGeneration.from_pretrained(model_name).to(device)
+    model.eval()
+    return model
@@ -0,0 +1,298 @@
+# onnx_backend.py
+# Agam Grewal – Capstone: ONNX Runtime (CPU) execution of BLIP-VQA
+#
+#   python -m src.vqa export-onnx [--model ...] [--output-dir ...]
+#   python -m src.vqa run --mode baseline --backend onnx
+#
+# The model is exported as three graphs with dynamic batch and sequence axes:
+#   vision.onnx     pixel_values -> image_embeds
+#   question.onnx   input_ids, attention_mask, image_embeds -> question_embeds
+#   decoder.onnx    input_ids, encoder_hidden_states, encoder_attention_mask -> next-token logits
+# Answers are decoded greedily, re-running the decoder over the whole prefix
+# each step (no past key/values graph); VQA answers are only a few tokens long.
+# Exporting also checks the graphs against PyTorch and times both, see parity.json.
+
+import os
+import json
+import time
+
+import numpy as np
+
+ONNX_DIR = "src/data/cache/onnx"
+GRAPHS = ("vision", "question", "decoder")
+PARITY_FILE = "parity.json"
+
+
+def onnx_dir_for(model_name, root=ONNX_DIR):
+    return os.path.join(root, model_name.strip("/").replace("/", "__"))
+
+
+def _wrappers(model):
+    import torch
+
+    class Vision(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.vision_model = model.vision_model
+
+        def forward(self, pixel_values):
+            return self.vision_model(pixel_values=pixel_values, return_dict=False)[0]
+
+    class Question(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.text_encoder = model.text_encoder
+
+        def forward(self, input_ids, attention_mask, image_embeds):
+            image_mask = torch.ones(image_embeds.shape[:-1], dtype=torch.long, device=image_embeds.device)
+            return self.text_encoder(
+                input_ids=input_ids, attention_mask=attention_mask, encoder_hidden_states=image_embeds,
+                encoder_attention_mask=image_mask, return_dict=False,
+            )[0]
+
+    class Decoder(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.text_decoder = model.text_decoder
+
+        def forward(self, input_ids, encoder_hidden_states, encoder_attention_mask):
+            logits = self.text_decoder(
+                input_ids=input_ids, encoder_hidden_states=encoder_hidden_states,
+                encoder_attention_mask=encoder_attention_mask, return_dict=False,
+            )[0]
+            return logits[:, -1, :]
+
+    return Vision().eval(), Question().eval(), Decoder().eval()
+
+
+def _sample_inputs(model, batch=2, question_len=8, answer_len=3, seed=0):
+    import torch
+
+    generator = torch.Generator().manual_seed(seed)
+    vision = model.config.vision_config
+    text = model.config.text_config
+    pixel_values = torch.randn(batch, 3, vision.image_size, vision.image_size, generator=generator)
+    num_patches = (vision.image_size // vision.patch_size) ** 2 + 1
+    image_embeds = torch.randn(batch, num_patches, vision.hidden_size, generator=generator)
+    input_ids = torch.randint(5, text.vocab_size, (batch, question_len), generator=generator)
+    attention_mask = torch.ones(batch, question_len, dtype=torch.long)
+    attention_mask[0, question_len // 2:] = 0  # one padded row, as in a real batch
+    question_embeds = torch.randn(batch, question_len, text.hidden_size, generator=generator)
+    answer_ids = torch.randint(5, text.vocab_size, (batch, answer_len), generator=generator)
+    return {
+        "vision": (pixel_values,),
+        "question": (input_ids, attention_mask, image_embeds),
+        "decoder": (answer_ids, question_embeds, attention_mask),
+    }
+
+
+def export_onnx(model, out_dir, opset=17, revision=None):
+    # revision: models.model_revision of the weights, recorded so load_onnx_model
+    # can tell when the graphs are stale. The model is exported in fp32 on CPU and
+    # put back on its own dtype and device afterwards.
+    import torch
+
+    os.makedirs(out_dir, exist_ok=True)
+    param = next(model.parameters())
+    dtype, device = param.dtype, param.device
+    model.float().cpu()
+    inputs = _sample_inputs(model)
+    specs = {
+        "vision": (["pixel_values"], ["image_embeds"], {"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}}),
+        "question": (
+            ["input_ids", "attention_mask", "image_embeds"], ["question_embeds"],
+            {"input_ids": {0: "batch", 1: "question_len"}, "attention_mask": {0: "batch", 1: "question_len"},
+             "image_embeds": {0: "batch"}, "question_embeds": {0: "batch", 1: "question_len"}},
+        ),
+        "decoder": (
+            ["input_ids", "encoder_hidden_states", "encoder_attention_mask"], ["logits"],
+            {"input_ids": {0: "batch", 1: "answer_len"}, "encoder_hidden_states": {0: "batch", 1: "question_len"},
+             "encoder_attention_mask": {0: "batch", 1: "question_len"}, "logits": {0: "batch"}},
+        ),
+    }
+    try:
+        with torch.inference_mode():
+            for name, module in zip(GRAPHS, _wrappers(model)):
+                input_names, output_names, axes = specs[name]
+                torch.onnx.export(
+                    module, inputs[name], os.path.join(out_dir, f"{name}.onnx"), input_names=input_names,
+                    output_names=output_names, dynamic_axes=axes, opset_version=opset, dynamo=False,
+                )
+    finally:
+        model.to(device=device, dtype=dtype)
+    with open(os.path.join(out_dir, "config.json"), "w") as f:
+        json.dump({
+            "decoder_start_token_id": model.decoder_start_token_id,
+            "sep_token_id": model.config.text_config.sep_token_id,
+            "pad_token_id": model.config.text_config.pad_token_id,
+            "opset": opset,
+            "model_revision": revision,
+        }, f, indent=2)
+    print(f"Exported {', '.join(GRAPHS)} graphs to {out_dir}")
+
+
+class OnnxBlipVQA:
+    # Stands in for the PyTorch model in engine.answer_image_groups (see is_onnx).
+    is_onnx = True
+
+    def __init__(self, onnx_dir, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.sessions = {
+            name: ort.InferenceSession(
+                os.path.join(onnx_dir, f"{name}.onnx"), options, providers=["CPUExecutionProvider"]
+            )
+            for name in GRAPHS
+        }
+        with open(os.path.join(onnx_dir, "config.json")) as f:
+            config = json.load(f)
+        self.bos = config["decoder_start_token_id"]
+        self.sep = config["sep_token_id"]
+        self.pad = config["pad_token_id"]
+
+    def image_embeds(self, pixel_values):
+        return self.sessions["vision"].run(None, {"pixel_values": pixel_values})[0]
+
+    def question_embeds(self, input_ids, attention_mask, image_embeds):
+        return self.sessions["question"].run(
+            None, {"input_ids": input_ids, "attention_mask": attention_mask, "image_embeds": image_embeds}
+        )[0]
+
+    def next_token_logits(self, answer_ids, question_embeds, attention_mask):
+        return self.sessions["decoder"].run(None, {
+            "input_ids": answer_ids, "encoder_hidden_states": question_embeds, "encoder_attention_mask": attention_mask,
+        })[0]
+
+    def generate(self, pixel_values, counts, input_ids, attention_mask, max_new_tokens=10):
+        # Same inputs as the PyTorch path (counts = questions per image); returns
+        # greedy answer ids, padded after [SEP] like transformers' generate.
+        image_embeds = np.repeat(self.image_embeds(pixel_values.astype(np.float32)), counts, axis=0)
+        question_embeds = self.question_embeds(input_ids, attention_mask, image_embeds)
+        answer_ids = np.full((len(input_ids), 1), self.bos, dtype=np.int64)
+        finished = np.zeros(len(input_ids), dtype=bool)
+        for _ in range(max_new_tokens):
+            next_ids = self.next_token_logits(answer_ids, question_embeds, attention_mask).argmax(axis=-1)
+            next_ids = np.where(finished, self.pad, next_ids)
+            answer_ids = np.concatenate([answer_ids, next_ids[:, None].astype(np.int64)], axis=1)
+            finished |= next_ids == self.sep
+            if finished.all():
+                break
+        return answer_ids
+
+
+def check_parity(model, onnx_model, processor, texts_per_image=None, seed=0):
+    # Max absolute difference of each graph's output against PyTorch, and the
+    # share of identical answers on random images and the given questions.
+    import torch
+    from .engine import encode_questions, generate_from_image_embeds
+
+    texts_per_image = texts_per_image or [
+        ["what is in the picture?", "how many people are there?"], ["is it sunny?"], ["what color is the bus?"],
+    ]
+    image_size = model.config.vision_config.image_size
+    pixel_values = torch.randn(len(texts_per_image), 3, image_size, image_size,
+                               generator=torch.Generator().manual_seed(seed))
+    counts = [len(texts) for texts in texts_per_image]
+    text_inputs = processor(text=[t for texts in texts_per_image for t in texts], padding="longest", return_tensors="pt")
+    input_ids, attention_mask = text_inputs["input_ids"], text_inputs["attention_mask"]
+
+    with torch.inference_mode():
+        image_embeds = model.vision_model(pixel_values=pixel_values)[0]
+        repeated = image_embeds.repeat_interleave(torch.tensor(counts), dim=0)
+        question_embeds = encode_questions(model, repeated, input_ids, attention_mask)
+        bos = torch.full((len(input_ids), 1), model.decoder_start_token_id)
+        logits = model.text_decoder(
+            input_ids=bos, encoder_hidden_states=question_embeds, encoder_attention_mask=attention_mask,
+            return_dict=True,
+        ).logits[:, -1, :]
+        torch_ids = generate_from_image_embeds(model, repeated, input_ids, attention_mask)
+
+    onnx_image = onnx_model.image_embeds(pixel_values.numpy())
+    onnx_question = onnx_model.question_embeds(
+        input_ids.numpy(), attention_mask.numpy(), np.repeat(onnx_image, counts, axis=0)
+    )
+    onnx_logits = onnx_model.next_token_logits(bos.numpy(), question_embeds.numpy(), attention_mask.numpy())
+    onnx_ids = onnx_model.generate(pixel_values.numpy(), counts, input_ids.numpy(), attention_mask.numpy())
+
+    torch_answers = processor.batch_decode(torch_ids, skip_special_tokens=True)
+    onnx_answers = processor.batch_decode(onnx_ids, skip_special_tokens=True)
+    return {
+        "vision_max_abs_diff": float(np.abs(onnx_image - image_embeds.numpy()).max()),
+        "question_max_abs_diff": float(np.abs(onnx_question - question_embeds.numpy()).max()),
+        "decoder_max_abs_diff": float(np.abs(onnx_logits - logits.numpy()).max()),
+        "answers_identical": float(np.mean([a == b for a, b in zip(torch_answers, onnx_answers)])),
+    }
+
+
+def compare_throughput(model, onnx_model, processor, num_images=8, questions_per_image=2, repeat=5):
+    # Questions/sec through engine.answer_image_groups for both, on random images.
+    import torch
+    from .engine import answer_image_groups
+    from .bench import measure
+
+    image_size = model.config.vision_config.image_size
+    pixel_values = torch.randn(num_images, 3, image_size, image_size)
+    texts = [["what is the man holding?", "is there a dog in this picture?"][:questions_per_image]] * num_images
+    items = num_images * questions_per_image
+    results = {}
+    for name, runner in (("pytorch_fp32", model), ("onnx", onnx_model)):
+        results[name] = measure(lambda: answer_image_groups(runner, processor, pixel_values, texts, "cpu"), items,
+                                repeat=repeat, warmup=1)
+    results["speedup"] = round(results["onnx"]["items_per_sec"] / results["pytorch_fp32"]["items_per_sec"], 3)
+    return results
+
+
+def export_and_check(model_name, out_dir=None, opset=17, repeat=5):
+    # What `python -m src.vqa export-onnx` runs: export, parity, throughput -> parity.json.
+    from .models import load_processor, load_vqa_model, model_revision
+
+    out_dir = out_dir or onnx_dir_for(model_name)
+    processor = load_processor(model_name)
+    model = load_vqa_model(model_name, "cpu")
+    start = time.perf_counter()
+    export_onnx(model, out_dir, opset, revision=model_revision(model_name))
+    report = {"model": model_name, "export_sec": round(time.perf_counter() - start, 2)}
+    onnx_model = OnnxBlipVQA(out_dir)
+    report["parity"] = check_parity(model, onnx_model, processor)
+    report["throughput"] = compare_throughput(model, onnx_model, processor, repeat=repeat)
+    with open(os.path.join(out_dir, PARITY_FILE), "w") as f:
+        json.dump(report, f, indent=2)
+
+    parity = report["parity"]
+    print(f"Max abs diff vs PyTorch: vision {parity['vision_max_abs_diff']:.2e}, "
+          f"question {parity['question_max_abs_diff']:.2e}, decoder {parity['decoder_max_abs_diff']:.2e}; "
+          f"{parity['answers_identical']:.0%} identical answers")
+    throughput = report["throughput"]
+    print(f"Throughput: PyTorch {throughput['pytorch_fp32']['items_per_sec']:.1f} q/s, "
+          f"ONNX Runtime {throughput['onnx']['items_per_sec']:.1f} q/s ({throughput['speedup']:.2f}x)")
+    print(f"Report saved to {os.path.join(out_dir, PARITY_FILE)}")
+    return report
+
+
+def exported_revision(onnx_dir):
+    # model_revision recorded by the export in onnx_dir, or None if there is no complete export.
+    config_path = os.path.join(onnx_dir, "config.json")
+    paths = [os.path.join(onnx_dir, f"{name}.onnx") for name in GRAPHS] + [config_path]
+    if not all(os.path.exists(path) for path in paths):
+        return None
+    with open(config_path) as f:
+        return json.load(f).get("model_revision")
+
+
+def load_onnx_model(model_name, onnx_dir=None, num_threads=None):
+    # Exports (and checks parity) on first use and whenever the weights changed
+    # since the last export, so `--backend onnx` never runs stale graphs.
+    from .models import model_revision
+
+    onnx_dir = onnx_dir or onnx_dir_for(model_name)
+    revision = model_revision(model_name)
+    exported = exported_revision(onnx_dir)
+    if exported != revision:
+        if exported is not None:
+            print(f"ONNX export in {onnx_dir} is for {exported}, not {revision}; re-exporting")
+        export_and_check(model_name, onnx_dir)
+    return OnnxBlipVQA(onnx_dir, num_threads)
@@ -0,0 +1,93 @@
+# pixel_cache.py
+# Agam Grewal – Capstone: Memory-mapped cache of preprocessed BLIP pixel tensors
+
+import os
+import json
+import hashlib
+import numpy as np
+from tqdm import tqdm
+
+from .loader import prefetch_images
+from .image_index import load_image_index
+
+PIXELS_FILE = "pixels.npy"
+INDEX_FILE = "index.json"
+
+
+def list_images(image_dir):
+    return [entry["fname"] for entry in load_image_index(image_dir).entries()]
+
+
+def cache_fingerprint(image_dir, fnames, image_processor, dtype):
+    # Changes whenever the processor config, the storage dtype or any image
+    # (name, content hash) in the manifest changes, which invalidates the cache.
+    by_name = {entry["fname"]: entry for entry in load_image_index(image_dir).entries()}
+    h = hashlib.sha256()
+    h.update(image_processor.to_json_string().encode())
+    h.update(np.dtype(dtype).str.encode())
+    for fname in fnames:
+        h.update(f"{fname}:{by_name[fname]['sha256']}\n".encode())
+    return h.hexdigest()
+
+
+class PixelCache:
+    def __init__(self, cache_dir):
+        with open(os.path.join(cache_dir, INDEX_FILE)) as f:
+            index = json.load(f)
+        self.fingerprint = index["fingerprint"]
+        self.offsets = index["offsets"]
+        self.errors = index["errors"]
+        self.pixels = np.load(os.path.join(cache_dir, PIXELS_FILE), mmap_mode="r")
+
+    def get(self, fname):
+        # Zero-copy view into the memory-mapped file, or None if the image is not cached.
+        row = self.offsets.get(fname)
+        return None if row is None else self.pixels[row]
+
+    def prefetch(self, paths):
+        # Drop-in replacement for loader.prefetch_images reading from the cache.
+        for key, img_path in paths:
+            fname = None if img_path is None else os.path.basename(img_path)
+            pixels = self.get(fname)
+            yield key, pixels, (None if pixels is not None else self.errors.get(fname))
+
+
+def build_pixel_cache(cache_dir, image_dir, image_processor, dtype=np.float16, num_workers=4, use_processes=False):
+    fnames = list_images(image_dir)
+    fingerprint = cache_fingerprint(image_dir, fnames, image_processor, dtype)
+    size = image_processor.size
+    os.makedirs(cache_dir, exist_ok=True)
+
+    tmp_pixels = os.path.join(cache_dir, "tmp_" + PIXELS_FILE)
+    pixels = np.lib.format.open_memmap(
+        tmp_pixels, mode="w+", dtype=dtype, shape=(len(fnames), 3, size["height"], size["width"])
+    )
+    offsets, errors = {}, {}
+    paths = ((fname, os.path.join(image_dir, fname)) for fname in fnames)
+    loaded = prefetch_images(paths, image_processor, num_workers, use_processes)
+    for fname, arr, error in tqdm(loaded, total=len(fnames), desc="Caching pixel tensors"):
+        if arr is None:
+            errors[fname] = error or "file not found"
+            continue
+        offsets[fname] = len(offsets)
+        pixels[offsets[fname]] = arr
+    pixels.flush()
+    del pixels
+
+    # The index is written last so an interrupted build is never picked up.
+    os.replace(tmp_pixels, os.path.join(cache_dir, PIXELS_FILE))
+    tmp_index = os.path.join(cache_dir, "tmp_" + INDEX_FILE)
+    with open(tmp_index, "w") as f:
+        json.dump({"fingerprint": fingerprint, "offsets": offsets, "errors": errors}, f)
+    os.replace(tmp_index, os.path.join(cache_dir, INDEX_FILE))
+    return PixelCache(cache_dir)
+
+
+def load_or_build_pixel_cache(cache_dir, image_dir, image_processor, dtype=np.float16, num_workers=4, use_processes=False):
+    index_path = os.path.join(cache_dir, INDEX_FILE)
+    if os.path.exists(index_path):
+        cache = PixelCache(cache_dir)
+        if cache.fingerprint == cache_fingerprint(image_dir, list_images(image_dir), image_processor, dtype):
+            return cache
+        print(f"Pixel cache in {cache_dir} is stale, rebuilding...")
+    return build_pixel_cache(cache_dir, image_dir, image_processor, dtype, num_workers, use_processes)
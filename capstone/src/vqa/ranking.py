@@ -0,0 +1,104 @@
+# ranking.py
+# Agam Grewal – Capstone: Closed-vocabulary answer ranking
+#
+# Instead of generating up to max_new_tokens per question, the answer decoder
+# scores a fixed candidate list: the most frequent (normalized) multiple-choice
+# answers in the annotations. As in BLIP's own rank_answer, one decoder step
+# from [DEC] ranks every candidate by the probability of its first token, and
+# only the top k are scored in full with one batched teacher-forced forward
+# pass. Latency no longer depends on how long an answer the model wants to
+# write, and every answer is a well-formed VQA answer.
+
+import os
+import json
+import hashlib
+from collections import Counter
+
+import numpy as np
+
+from .answers import normalize_answer
+
+CANDIDATE_CACHE_DIR = "src/data/cache/candidates"
+NUM_CANDIDATES = 3129  # the usual VQA v2 answer vocabulary size
+TOP_K = 128
+SCORE_CHUNK = 256  # candidate sequences per decoder forward, bounds the (n, len, vocab) logits
+
+
+def candidate_answers(store, num_candidates=NUM_CANDIDATES):
+    # Most frequent multiple-choice answers after VQA normalization, ties by first seen.
+    codes = np.asarray(store.column("multiple_choice_answer"))
+    counts = np.bincount(codes[codes >= 0], minlength=len(store.vocab["multiple_choice_answer"]))
+    merged = Counter()
+    for answer, count in zip(store.vocab["multiple_choice_answer"], counts.tolist()):
+        if count:
+            merged[normalize_answer(answer)] += count
+    merged.pop("", None)
+    return [answer for answer, _ in merged.most_common(num_candidates)]
+
+
+class Candidates:
+    # Token ids for each candidate, starting with the decoder's BOS and ending in [SEP].
+    def __init__(self, answers, input_ids, attention_mask, top_k=TOP_K):
+        self.answers = answers
+        self.input_ids = input_ids
+        self.attention_mask = attention_mask
+        self.top_k = top_k  # candidates scored in full per question
+
+    def to(self, device):
+        return Candidates(self.answers, self.input_ids.to(device), self.attention_mask.to(device), self.top_k)
+
+
+def load_candidates(tokenizer, answers, bos_token_id, model_name, cache_dir=CANDIDATE_CACHE_DIR, top_k=TOP_K):
+    # Tokenized once per (model, candidate list) and cached as .npz.
+    import torch
+
+    key = hashlib.sha256(json.dumps([model_name, bos_token_id, answers]).encode()).hexdigest()[:16]
+    path = os.path.join(cache_dir, f"{key}.npz")
+    if os.path.exists(path):
+        data = np.load(path)
+        input_ids, attention_mask = data["input_ids"], data["attention_mask"]
+    else:
+        tokens = tokenizer(answers, padding="longest", return_tensors="np")
+        input_ids, attention_mask = tokens["input_ids"].astype(np.int64), tokens["attention_mask"].astype(np.int64)
+        input_ids[:, 0] = bos_token_id
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, input_ids=input_ids, attention_mask=attention_mask)
+        os.replace(tmp, path)
+    return Candidates(answers, torch.from_numpy(input_ids), torch.from_numpy(attention_mask), top_k)
+
+
+def rank_answers(model, question_embeds, question_mask, candidates, k=None, chunk=SCORE_CHUNK):
+    # Returns the index into candidates.answers of the best answer per question.
+    import torch
+
+    k = min(k or candidates.top_k, len(candidates.answers))
+    decoder = model.text_decoder
+    n = question_embeds.size(0)
+    bos = candidates.input_ids[:1, :1].expand(n, 1)
+    first_logits = decoder(
+        input_ids=bos, encoder_hidden_states=question_embeds, encoder_attention_mask=question_mask, return_dict=True,
+    ).logits[:, 0, :]
+    first_probs = first_logits.float().softmax(dim=-1).index_select(1, candidates.input_ids[:, 1])
+    top_ids = first_probs.topk(k, dim=1).indices  # (n, k)
+
+    flat = top_ids.reshape(-1)
+    input_ids = candidates.input_ids[flat]
+    attention_mask = candidates.attention_mask[flat]
+    question_of = torch.arange(len(flat), device=flat.device) // k
+    scores = []
+    for start in range(0, len(flat), chunk):
+        end = start + chunk
+        rows = question_of[start:end]
+        logits = decoder(
+            input_ids=input_ids[start:end], attention_mask=attention_mask[start:end],
+            encoder_hidden_states=question_embeds[rows], encoder_attention_mask=question_mask[rows],
+            return_logits=True,
+        )
+        # Sum of log p(token) over each candidate's real tokens after BOS.
+        log_probs = logits.float().log_softmax(dim=-1)
+        targets = input_ids[start:end, 1:]
+        token_scores = log_probs.gather(-1, targets.unsqueeze(-1)).squeeze(-1)
+        scores.append((token_scores * attention_mask[start:end, 1:]).sum(dim=1))
+    best = torch.cat(scores).view(n, k).argmax(dim=1)
+    return top_ids.gather(1, best.unsqueeze(1)).squeeze(1).tolist()
@@ -0,0 +1,206 @@
+# rundiff.py
+# Agam Grewal – Capstone: Cross-run prediction diffs
+#
+# Any number of prediction files are joined on question_id into aligned
+# (runs, questions) arrays of interned answer ids and per-run correctness, so
+# agreement and every right/wrong category are NumPy masks rather than dict
+# lookups and scans. Each prediction file is parsed once into a small .npz
+# (question ids, answer codes and its distinct answer strings) that is reused
+# until the file changes, so comparing dozens of full-size runs stays quick.
+#
+#   python -m src.vqa diff results/baseline_predictions.json results/caption_predictions.json \
+#       [--sample only_baseline_right --k 4 --seed 0] [--output results/diff.json]
+
+import os
+import json
+import hashlib
+
+import numpy as np
+
+from .annotations import source_fingerprint
+
+PREDICTION_CACHE_DIR = "src/data/cache/predictions"
+
+
+def run_name(path):
+    # results/caption_rank_predictions.json -> caption_rank
+    name = os.path.splitext(os.path.basename(path))[0]
+    return name[: -len("_predictions")] if name.endswith("_predictions") else name
+
+
+def load_prediction_columns(path, cache_dir=PREDICTION_CACHE_DIR):
+    # Returns (question_ids, codes, answers): codes index into the file's own
+    # list of distinct raw answer strings.
+    key = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:8]
+    cache_path = os.path.join(cache_dir, f"{run_name(path)}_{key}.npz")
+    fingerprint = source_fingerprint(path)
+    if os.path.exists(cache_path):
+        data = np.load(cache_path)
+        if str(data["fingerprint"]) == fingerprint:
+            return data["question_id"], data["codes"], data["answers"].tolist()
+
+    with open(path) as f:
+        predictions = json.load(f)
+    distinct = {}
+    question_ids = np.fromiter((p["question_id"] for p in predictions), dtype=np.int64, count=len(predictions))
+    codes = np.fromiter((distinct.setdefault(p.get("answer", ""), len(distinct)) for p in predictions),
+                        dtype=np.int64, count=len(predictions))
+    answers = list(distinct)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = cache_path + ".tmp.npz"
+    np.savez(tmp, question_id=question_ids, codes=codes, answers=np.array(answers, dtype=str),
+             fingerprint=np.array(fingerprint))
+    os.replace(tmp, cache_path)
+    return question_ids, codes, answers
+
+
+class RunDiff:
+    # answers[r, i]: interned (normalized) answer of run r to question_ids[i], -1
+    # if the run has no prediction for it; correct[r, i] is False there too.
+    def __init__(self, runs, question_ids, answers, correct, gt):
+        self.runs = runs
+        self.question_ids = question_ids
+        self.answers = answers
+        self.correct = correct
+        self.gt = gt
+
+    @classmethod
+    def from_files(cls, paths, gt, metric="strict", names=None, cache_dir=PREDICTION_CACHE_DIR):
+        # gt: scoring.GroundTruth; metric: "strict" or "any_match" (see scoring.Scores).
+        # Questions are the union over all runs, restricted to annotated ones.
+        columns = [load_prediction_columns(path, cache_dir) for path in paths]
+        question_ids = np.unique(np.concatenate([qids for qids, _, _ in columns] + [np.empty(0, np.int64)]))
+        question_ids = question_ids[gt.rows(question_ids) < len(gt.question_ids)]
+
+        answers = np.full((len(paths), len(question_ids)), -1, dtype=np.int64)
+        correct = np.zeros((len(paths), len(question_ids)), dtype=bool)
+        for r, (qids, codes, strings) in enumerate(columns):
+            # Each distinct answer string is normalized once, then mapped with indexing.
+            ids = gt.vocab.intern_all(strings) if strings else np.empty(0, np.int64)
+            pos = np.searchsorted(question_ids, qids)
+            found = (pos < len(question_ids)) & (question_ids[np.minimum(pos, len(question_ids) - 1)] == qids)
+            pos, pred = pos[found], ids[codes[found]]
+            answers[r, pos] = pred
+            correct[r, pos] = getattr(gt.score_ids(question_ids[pos], pred), metric)
+        return cls(names or [run_name(path) for path in paths], question_ids, answers, correct, gt)
+
+    def __len__(self):
+        return len(self.question_ids)
+
+    def _run(self, run):
+        return run if isinstance(run, int) else self.runs.index(run)
+
+    def answer_strings(self, run, mask=None):
+        names = self.gt.vocab.strings()
+        codes = self.answers[self._run(run)] if mask is None else self.answers[self._run(run), mask]
+        return [names[c] if c >= 0 else None for c in codes.tolist()]
+
+    def expected_strings(self, mask=None):
+        names = self.gt.vocab.strings()
+        rows = self.gt.rows(self.question_ids if mask is None else self.question_ids[mask])
+        return [names[c] for c in self.gt.mc[rows].tolist()]
+
+    def categories(self):
+        # {name: boolean mask over question_ids}. Cross-run categories only count
+        # questions every run answered; per-run ones compare a run against all others.
+        answered = (self.answers >= 0).all(axis=0)
+        right = self.correct.sum(axis=0)
+        n = len(self.runs)
+        same = (self.answers == self.answers[:1]).all(axis=0)
+        categories = {
+            "all_answered": answered,
+            "all_right": answered & (right == n),
+            "all_wrong": answered & (right == 0),
+            "all_wrong_same_answer": answered & (right == 0) & same,
+            "mixed": answered & (right > 0) & (right < n),
+            "all_agree": answered & same,
+        }
+        if n > 1:
+            for r, run in enumerate(self.runs):
+                categories[f"only_{run}_right"] = answered & self.correct[r] & (right == 1)
+                categories[f"only_{run}_wrong"] = answered & ~self.correct[r] & (right == n - 1)
+        return categories
+
+    def pair(self, a, b):
+        # Masks for two runs over the questions both answered.
+        a, b = self._run(a), self._run(b)
+        both = (self.answers[a] >= 0) & (self.answers[b] >= 0)
+        ca, cb = self.correct[a], self.correct[b]
+        same = self.answers[a] == self.answers[b]
+        return {
+            "both_right": both & ca & cb,
+            f"{self.runs[a]}_right_{self.runs[b]}_wrong": both & ca & ~cb,
+            f"{self.runs[b]}_right_{self.runs[a]}_wrong": both & ~ca & cb,
+            "both_wrong_same_answer": both & ~ca & ~cb & same,
+            "both_wrong_different_answer": both & ~ca & ~cb & ~same,
+        }
+
+    def agreement(self):
+        # (runs, runs) share of jointly answered questions with the same answer.
+        n = len(self.runs)
+        matrix = np.ones((n, n))
+        for a in range(n):
+            for b in range(a + 1, n):
+                both = (self.answers[a] >= 0) & (self.answers[b] >= 0)
+                shared = int(both.sum())
+                same = (self.answers[a][both] == self.answers[b][both]).sum()
+                matrix[a, b] = matrix[b, a] = same / shared if shared else np.nan
+        return matrix
+
+    def sample(self, mask, k, seed=0):
+        # Up to k question ids from a mask (or category name), reproducible per seed.
+        if isinstance(mask, str):
+            mask = {**self.categories(), **(self.pair(0, 1) if len(self.runs) > 1 else {})}[mask]
+        candidates = self.question_ids[mask]
+        rng = np.random.default_rng(seed)
+        return rng.choice(candidates, size=min(k, len(candidates)), replace=False).tolist()
+
+    def summary(self):
+        return {
+            "runs": self.runs,
+            "questions": len(self),
+            "accuracy": {run: round(float(self.correct[r][answered].mean() * 100), 2) if answered.any() else 0.0
+                         for r, run, answered in zip(range(len(self.runs)), self.runs, self.answers >= 0)},
+            "categories": {name: int(mask.sum()) for name, mask in self.categories().items()},
+            "agreement": [[None if np.isnan(v) else round(float(v), 4) for v in row] for row in self.agreement()],
+        }
+
+    def export(self, path):
+        # Summary plus the question ids in every cross-run category (and the
+        # first two runs' pairwise categories).
+        masks = self.categories()
+        if len(self.runs) > 1:
+            masks.update(self.pair(0, 1))
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({**self.summary(),
+                       "question_ids": {name: self.question_ids[mask].tolist() for name, mask in masks.items()}}, f)
+
+
+def diff_runs(paths, question_path, annotation_path, metric="strict", output=None, sample=None, k=5, seed=0):
+    from .annotations import load_annotation_store
+    from .scoring import GroundTruth
+
+    store = load_annotation_store(question_path, annotation_path)
+    diff = RunDiff.from_files(paths, GroundTruth.from_store(store), metric)
+    summary = diff.summary()
+    print(f"{summary['questions']:,} annotated questions across {len(diff.runs)} runs ({metric})")
+    width = max(len(run) for run in diff.runs)
+    for run, accuracy in summary["accuracy"].items():
+        print(f"  {run:<{width}}  {accuracy:6.2f}%")
+    for name, count in summary["categories"].items():
+        print(f"  {name:<{width + 20}} {count:>9,}")
+    if len(diff.runs) > 1:
+        print("Agreement (same normalized answer):")
+        for run, row in zip(diff.runs, summary["agreement"]):
+            print(f"  {run:<{width}}  " + "  ".join("   n/a" if v is None else f"{v * 100:5.1f}%" for v in row))
+    if output:
+        diff.export(output)
+        print(f"Saved categories to {output}")
+    if sample:
+        for qid in diff.sample(sample, k, seed):
+            record = store.record(store.row(qid))
+            at = [np.searchsorted(diff.question_ids, qid)]
+            answers = ", ".join(f"{run}: {diff.answer_strings(run, at)[0]}" for run in diff.runs)
+            print(f"[{qid}] {record['question']}  GT: {diff.expected_strings(at)[0]}  {answers}")
+    return diff
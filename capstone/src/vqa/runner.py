@@ -0,0 +1,306 @@
+# runner.py
+# Agam Grewal – Capstone: Baseline and caption-augmented BLIP-VQA runs
+# Shared by `python -m src.vqa run` and the models/run_vqa_*_inference.py wrappers.
+
+import os
+import json
+import time
+import dataclasses
+from dataclasses import dataclass
+from functools import partial
+from typing import Optional
+
+import numpy as np
+
+from .data import (
+    IMAGE_DIR, QUESTION_PATH, ANNOTATION_PATH, CAPTION_FILE, PIXEL_CACHE_DIR, RESULTS_DIR,
+    PROMPT_BUILDERS, load_merged,
+)
+from .models import VQA_MODEL, CAPTION_MODEL, default_device, load_processor, model_revision
+from .checkpoint import PredictionWriter, load_done_ids, iter_predictions, compact_predictions
+from .pixel_cache import PixelCache, load_or_build_pixel_cache
+from .sharding import run_sharded
+from .caption_store import STORE_DIR, load_store_captions
+from .backends import load_backend_model
+from .scoring import GroundTruth
+from .metrics import StageTimer, ResourceSampler, write_metrics
+from .answer_cache import ANSWER_CACHE_PATH, MAX_ENTRIES, AnswerCache
+from .annotations import load_annotation_store, source_fingerprint
+from .ranking import NUM_CANDIDATES, TOP_K, candidate_answers, load_candidates
+
+RUN_TITLES = {
+    "baseline": ("Running baseline BLIP-VQA", "Baseline Accuracy"),
+    "caption": ("Running BLIP-VQA with captions", "Caption-Augmented Accuracy"),
+}
+
+
+@dataclass
+class RunConfig:
+    mode: str = "baseline"
+    model_name: str = VQA_MODEL
+    image_dir: str = IMAGE_DIR
+    question_path: str = QUESTION_PATH
+    annotation_path: str = ANNOTATION_PATH
+    caption_file: str = CAPTION_FILE  # legacy captions JSONL, imported into the store on first use
+    caption_model: str = CAPTION_MODEL  # captions are looked up by (image hash, caption_model, params)
+    caption_store_dir: str = STORE_DIR
+    results_dir: str = RESULTS_DIR
+    device: Optional[str] = None
+    batch_size: int = 16  # questions per generate call; questions about one image stay together
+    max_tokens: Optional[int] = None  # padded prompt tokens per generate call; replaces batch_size when set
+    num_workers: int = 4  # image decode/preprocess workers feeding the model
+    use_processes: bool = False  # process pool instead of threads for decoding
+    pixel_cache_dir: Optional[str] = PIXEL_CACHE_DIR  # None decodes JPEGs every run
+    flush_every: int = 256  # predictions between checkpoint flushes
+    resume: bool = True  # skip question_ids already in the checkpoint; False starts over
+    num_shards: int = 1  # worker processes, each with its own model copy; 1 runs in-process
+    threads_per_shard: Optional[int] = None  # torch threads per worker; None splits the cores evenly
+    backend: str = "fp32"  # fp32 | int8 | bf16 | compile | onnx, see backends.py
+    tolerance: float = 0.5  # accuracy points a backend may lose against the fp32 predictions
+    max_new_tokens: int = 10  # answer length limit passed to generate
+    answer_mode: str = "generate"  # generate | rank (closed vocabulary, see ranking.py)
+    num_candidates: int = NUM_CANDIDATES  # rank mode: most frequent annotation answers to choose from
+    rank_k: int = TOP_K  # rank mode: candidates scored in full per question
+    answer_cache_path: Optional[str] = ANSWER_CACHE_PATH  # None always generates
+    answer_cache_size: Optional[int] = MAX_ENTRIES  # most recently used answers kept; None keeps all
+
+    @property
+    def run_name(self):
+        # fp32 generate keeps the original file names; other backends and the
+        # ranking mode get their own files next to them.
+        name = self.mode if self.backend == "fp32" else f"{self.mode}_{self.backend}"
+        return name if self.answer_mode == "generate" else f"{name}_{self.answer_mode}"
+
+    @property
+    def output_path(self):
+        return os.path.join(self.results_dir, f"{self.run_name}_predictions.json")
+
+    @property
+    def checkpoint_path(self):
+        return os.path.join(self.results_dir, f"{self.run_name}_predictions.jsonl")
+
+    @property
+    def summary_path(self):
+        return os.path.join(self.results_dir, f"{self.run_name}_accuracy_summary.json")
+
+    @property
+    def metrics_path(self):
+        return os.path.join(self.results_dir, f"{self.run_name}_metrics.json")
+
+
+def load_items(config):
+    captions = None
+    if config.mode == "caption":
+        captions = load_store_captions(
+            config.image_dir, config.caption_model, store_dir=config.caption_store_dir, legacy_file=config.caption_file
+        )
+    merged = load_merged(config.question_path, config.annotation_path, captions)
+    kind = "question–answer–caption triples" if captions is not None else "question–answer pairs"
+    print(f"Loaded {len(merged)} {kind}.")
+    return merged
+
+
+def open_answer_cache(config):
+    # Answers depend on the weights, the backend's numerics, the pixel input
+    # (fp16 pixel cache vs freshly decoded JPEGs) and the decoding limit, so all
+    # of them are part of the key; the prompt carries the mode. Ranked answers
+    # also depend on the candidates, which come from the annotation file's
+    # contents rather than its path.
+    pixels = "float16_cache" if config.pixel_cache_dir else "decoded"
+    params = {"backend": config.backend, "pixels": pixels, "max_new_tokens": config.max_new_tokens}
+    if config.answer_mode == "rank":
+        params = {"backend": config.backend, "pixels": pixels, "answer_mode": "rank",
+                  "num_candidates": config.num_candidates, "rank_k": config.rank_k,
+                  "annotations": source_fingerprint(config.annotation_path)}
+    return AnswerCache(
+        config.answer_cache_path, model_revision(config.model_name), params,
+        max_entries=config.answer_cache_size,
+    )
+
+
+def load_run_candidates(config, processor, model):
+    # The candidate list comes from the run's own annotation file.
+    store = load_annotation_store(config.question_path, config.annotation_path)
+    answers = candidate_answers(store, config.num_candidates)
+    candidates = load_candidates(
+        processor.tokenizer, answers, model.decoder_start_token_id, config.model_name, top_k=config.rank_k
+    )
+    print(f"Ranking answers from {len(answers)} candidates (top {config.rank_k} scored in full)")
+    return candidates.to(config.device)
+
+
+def run_shard(config, items, checkpoint_path, processor=None, model=None, pixel_cache=None):
+    # Runs in a forked worker when num_shards > 1, which loads its own model copy;
+    # the pixel cache was already built by the parent and is only reopened here.
+    # Answers found in the answer cache are written straight to the checkpoint,
+    # and the model is only loaded if anything is left to generate.
+    # Returns (missing images, StageTimer).
+    from .engine import run_grouped_inference
+
+    done = load_done_ids(checkpoint_path) if config.resume else set()
+    if done:
+        print(f"Resuming: {len(done)} predictions already in {checkpoint_path}")
+    todo = [m for m in items if m["question_id"] not in done]
+
+    timer = StageTimer()
+    cache = open_answer_cache(config) if config.answer_cache_path else None
+    with PredictionWriter(checkpoint_path, config.flush_every, resume=config.resume) as writer:
+        write = writer.write  # new answers also go to the answer cache when there is one
+        missing = 0
+        if cache is not None:
+            with timer.stage("answer_cache"):
+                hits, todo, no_image = cache.lookup(todo, config.image_dir, PROMPT_BUILDERS[config.mode])
+                missing = len(no_image)
+                for record in hits:
+                    writer.write(record)
+            timer.count("answer_cache_hits", len(hits))
+            print(f"Answer cache: {len(hits)} hits, {len(todo)} to generate")
+
+            def write_and_cache(record):
+                writer.write(record)
+                cache.put(record)
+
+            write = write_and_cache
+
+        if todo:
+            if processor is None:
+                processor = load_processor(config.model_name)
+            if model is None:
+                model = load_backend_model(config.model_name, config.backend, config.device)
+            if pixel_cache is None and config.pixel_cache_dir:
+                pixel_cache = PixelCache(config.pixel_cache_dir)
+            candidates = load_run_candidates(config, processor, model) if config.answer_mode == "rank" else None
+            missing += run_grouped_inference(
+                model, processor, todo, config.image_dir, config.device, PROMPT_BUILDERS[config.mode], write,
+                batch_size=config.batch_size, num_workers=config.num_workers, use_processes=config.use_processes,
+                pixel_cache=pixel_cache, desc=RUN_TITLES[config.mode][0], backend=config.backend, timer=timer,
+                max_tokens=config.max_tokens, max_new_tokens=config.max_new_tokens, candidates=candidates,
+            )
+    if cache is not None:
+        cache.close()
+    return missing, timer
+
+
+def write_run_metrics(config, timer, sampler, wall_sec):
+    # Only covers the questions answered by this invocation; resumed ones were timed before.
+    answered = len(timer.samples.get("per_question", ()))
+    if not answered:
+        # Everything came from the checkpoint or answer cache: keep the timings of
+        # the run that actually generated the answers.
+        hits = timer.counters.get("answer_cache_hits", 0)
+        print(f"No questions generated ({hits} answer cache hits); {config.metrics_path} left unchanged")
+        return
+    write_metrics(config.metrics_path, {
+        "run": config.run_name,
+        "backend": config.backend,
+        "answer_mode": config.answer_mode,
+        "device": config.device,
+        "batch_size": config.batch_size,
+        "max_tokens": config.max_tokens,
+        "num_shards": config.num_shards,
+        "pixel_cache": bool(config.pixel_cache_dir),
+        "questions": answered,
+        "answer_cache_hits": timer.counters.get("answer_cache_hits", 0),
+        "wall_sec": round(wall_sec, 3),
+        "questions_per_sec": round(answered / wall_sec, 3) if wall_sec else 0,
+        "padding_efficiency": timer.padding_efficiency(),
+        "stages": timer.summary(),
+        "resources": sampler.summary(),
+    })
+    print(f"Answered {answered} questions in {wall_sec:.1f}s ({answered / wall_sec if wall_sec else 0:.2f}/s); "
+          f"metrics in {config.metrics_path}")
+    efficiency = timer.padding_efficiency()
+    if efficiency is not None:
+        print(f"Padding efficiency: {efficiency:.1%} of prompt tokens were real")
+
+
+def backend_delta(config, gt, scores):
+    # Compares against the fp32 predictions on the questions both runs answered,
+    # so a partial reference run still gives a like-for-like delta.
+    reference_path = dataclasses.replace(config, backend="fp32").checkpoint_path
+    reference = gt.score(iter_predictions(reference_path))
+    shared, ours, theirs = np.intersect1d(scores.question_id, reference.question_id, return_indices=True)
+    if not len(shared):
+        return None
+    delta = (scores.strict[ours].mean() - reference.strict[theirs].mean()) * 100
+    agreement = (scores.answer[ours] == reference.answer[theirs]).mean() * 100
+    return {
+        "reference": reference_path,
+        "compared": len(shared),
+        "agreement": round(float(agreement), 2),
+        "accuracy_delta": round(float(delta), 2),
+        "tolerance": config.tolerance,
+        "within_tolerance": bool(delta >= -config.tolerance),
+    }
+
+
+def summarize_accuracy(config, items, num_saved):
+    gt = GroundTruth.from_items(items)
+    scores = gt.score(iter_predictions(config.checkpoint_path))
+    accuracy = scores.accuracy()
+
+    summary = {
+        "evaluated": num_saved,
+        "correct": int(scores.strict.sum()),
+        "accuracy": round(accuracy, 2),
+    }
+    if config.backend != "fp32":
+        summary["backend"] = config.backend
+        summary["vs_fp32"] = backend_delta(config, gt, scores)
+    with open(config.summary_path, "w") as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"{RUN_TITLES[config.mode][1]} ({config.backend}): {accuracy:.2f}%")
+    delta = summary.get("vs_fp32")
+    if delta:
+        verdict = "within" if delta["within_tolerance"] else "OUTSIDE"
+        print(f"  vs fp32 on {delta['compared']} questions: {delta['accuracy_delta']:+.2f} points, "
+              f"{delta['agreement']:.2f}% identical answers ({verdict} tolerance of {config.tolerance})")
+    elif config.backend != "fp32":
+        print("  No fp32 predictions to compare against; run with --backend fp32 first.")
+    return summary
+
+
+def run_inference(config):
+    if config.device is None:
+        config = dataclasses.replace(config, device="cpu" if config.backend == "onnx" else default_device())
+    if config.backend == "onnx" and config.answer_mode == "rank":
+        raise ValueError("Answer ranking needs a PyTorch backend")
+    items = load_items(config)
+
+    processor = load_processor(config.model_name)
+    pixel_cache = None
+    if config.pixel_cache_dir:
+        pixel_cache = load_or_build_pixel_cache(
+            config.pixel_cache_dir, config.image_dir, processor.image_processor,
+            num_workers=config.num_workers, use_processes=config.use_processes,
+        )
+
+    # Shard workers load their models inside the timed section; in-process runs load it
+    # first, unless the answer cache is on and may make it unnecessary.
+    model = None
+    if config.num_shards == 1 and not config.answer_cache_path:
+        model = load_backend_model(config.model_name, config.backend, config.device)
+    start = time.perf_counter()
+    with ResourceSampler() as sampler:
+        if config.num_shards > 1:
+            results = run_sharded(
+                partial(run_shard, config), items, config.checkpoint_path, config.num_shards, config.threads_per_shard,
+                resume=config.resume,
+            )
+        else:
+            results = [run_shard(config, items, config.checkpoint_path, processor, model, pixel_cache)]
+    missing = sum(shard_missing for shard_missing, _ in results)
+    timer = StageTimer()
+    for _, shard_timer in results:
+        timer.merge(shard_timer)
+    write_run_metrics(config, timer, sampler, time.perf_counter() - start)
+
+    # Back in question-file order, whatever order the scheduler answered in.
+    num_saved = compact_predictions(
+        config.checkpoint_path, config.output_path, [item["question_id"] for item in items]
+    )
+    print(f"Saved {num_saved} predictions to {config.output_path}")
+    print(f"Missing images: {missing}")
+
+    return summarize_accuracy(config, items, num_saved)
@@ -0,0 +1,161 @@
+# scoring.py
+# Agam Grewal – Capstone: Vectorized answer scoring shared by the runs and the evaluators
+#
+# Answers are normalized once per distinct string and interned into integer IDs,
+# so strict, VQA soft and per-type accuracy are NumPy comparisons over columns
+# instead of per-prediction Python loops.
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from .answers import normalize_answer
+
+
+class AnswerVocab:
+    def __init__(self, normalize=normalize_answer):
+        self.normalize = normalize
+        self.ids = {}  # normalized answer -> id
+        self._raw = {}  # raw answer -> id, so each distinct string is normalized once
+
+    def intern(self, answer):
+        answer_id = self._raw.get(answer)
+        if answer_id is None:
+            answer_id = self.ids.setdefault(self.normalize(answer), len(self.ids))
+            self._raw[answer] = answer_id
+        return answer_id
+
+    def intern_all(self, answers):
+        return np.fromiter((self.intern(a) for a in answers), dtype=np.int64, count=len(answers))
+
+    def strings(self):
+        # Normalized answer per id.
+        return list(self.ids)
+
+
+@dataclass
+class Scores:
+    # One entry per prediction, in prediction order.
+    question_id: np.ndarray
+    answer: np.ndarray  # interned predicted answer
+    row: np.ndarray  # ground-truth row; the last row stands in for unknown questions
+    strict: np.ndarray  # prediction == multiple_choice_answer
+    any_match: np.ndarray  # prediction matches at least one annotator
+    soft: np.ndarray  # official VQA accuracy in [0, 1]
+
+    def __len__(self):
+        return len(self.question_id)
+
+    def accuracy(self, column="strict"):
+        values = getattr(self, column)
+        return float(values.mean() * 100) if len(values) else 0.0
+
+    def by_group(self, labels, column="strict"):
+        # labels: one label per ground-truth row, e.g. GroundTruth.question_type.
+        # Returns {label: accuracy %} over the predictions in each group.
+        codes, inverse = np.unique(labels[self.row], return_inverse=True)
+        totals = np.bincount(inverse, minlength=len(codes))
+        sums = np.bincount(inverse, weights=getattr(self, column).astype(np.float64), minlength=len(codes))
+        return {str(c): float(s / t * 100) for c, s, t in zip(codes, sums, totals) if t}
+
+
+class GroundTruth:
+    # Columnar ground truth sorted by question_id. Row len(question_ids) is a
+    # sentinel for questions without annotations: its answer is "" and it has no
+    # annotator answers, which matches how the old dict lookups defaulted.
+    def __init__(self, question_ids, mc, answers, question_type, question_prefix, vocab, answer_type=None):
+        self.question_ids = question_ids
+        self.mc = mc
+        self.answers = answers  # (rows, max annotators) answer ids, -1 padded
+        self.question_type = question_type
+        self.question_prefix = question_prefix
+        self.vocab = vocab
+        # VQA answer type ("yes/no", "number", "other") per row.
+        if answer_type is None:
+            answer_type = np.full(len(question_ids) + 1, "other", dtype=object)
+        self.answer_type = answer_type
+
+    @classmethod
+    def from_annotations(cls, annotations, questions=None, vocab=None):
+        vocab = vocab or AnswerVocab()
+        annotations = sorted(annotations, key=lambda a: a["question_id"])
+        question_ids = np.array([a["question_id"] for a in annotations], dtype=np.int64)
+        mc = vocab.intern_all([a["multiple_choice_answer"] for a in annotations] + [""])
+
+        width = max((len(a.get("answers", ())) for a in annotations), default=0)
+        answers = np.full((len(annotations) + 1, width), -1, dtype=np.int64)
+        for i, a in enumerate(annotations):
+            given = a.get("answers", ())
+            answers[i, :len(given)] = vocab.intern_all([ans["answer"] for ans in given])
+
+        question_type = np.array([a.get("question_type", "Other") for a in annotations] + ["Other"], dtype=object)
+        answer_type = np.array([a.get("answer_type", "other") for a in annotations] + ["other"], dtype=object)
+        prefixes = {}
+        for q in questions or ():
+            text = q["question"].lower()
+            prefixes[q["question_id"]] = text.split(" ")[0] if text else "other"
+        question_prefix = np.array([prefixes.get(int(qid), "other") for qid in question_ids] + ["other"], dtype=object)
+        return cls(question_ids, mc, answers, question_type, question_prefix, vocab, answer_type)
+
+    @classmethod
+    def from_store(cls, store, vocab=None):
+        # From a compiled annotations.AnnotationStore: each distinct answer string is
+        # interned once and the stored codes are remapped with array indexing.
+        vocab = vocab or AnswerVocab()
+        rows = np.flatnonzero(store.has_annotation())
+        order = np.argsort(store.question_id[rows], kind="stable")
+        rows = rows[order]
+        code_to_id = np.append(vocab.intern_all(store.vocab["multiple_choice_answer"]), vocab.intern(""))
+
+        mc = code_to_id[np.append(store.column("multiple_choice_answer")[rows], -1)]
+        offsets = store.column("answers.offsets")
+        starts, counts = offsets[rows], offsets[rows + 1] - offsets[rows]
+        width = int(counts.max()) if len(counts) else 0
+        answers = np.full((len(rows) + 1, width), -1, dtype=np.int64)
+        filled = np.arange(width)[None, :] < counts[:, None]
+        flat = np.asarray(store.column("answers"))[(starts[:, None] + np.arange(width)[None, :])[filled]]
+        answers[:-1][filled] = code_to_id[flat]
+
+        types = np.array(store.vocab["question_type"] + ["Other"], dtype=object)
+        question_type = types[np.append(store.column("question_type")[rows], -1)]
+        answer_types = np.array(store.vocab["answer_type"] + ["other"], dtype=object)
+        answer_type = answer_types[np.append(store.column("answer_type")[rows], -1)]
+        prefixes = [text.lower().split(" ")[0] if text else "other" for text in store.texts("question", rows)]
+        question_prefix = np.array(prefixes + ["other"], dtype=object)
+        return cls(np.asarray(store.question_id[rows]), mc, answers, question_type, question_prefix, vocab, answer_type)
+
+    @classmethod
+    def from_items(cls, items, vocab=None):
+        # Merged run items carry only the multiple-choice answer.
+        return cls.from_annotations(
+            [{"question_id": m["question_id"], "multiple_choice_answer": m["answer"]} for m in items], vocab=vocab
+        )
+
+    def rows(self, question_ids):
+        n = len(self.question_ids)
+        if not n:
+            return np.zeros(len(question_ids), dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.question_ids, question_ids), n - 1)
+        return np.where(self.question_ids[pos] == question_ids, pos, n)
+
+    def score(self, predictions):
+        # predictions: iterable of {"question_id", "answer"} records.
+        predictions = list(predictions)
+        question_ids = np.fromiter((p["question_id"] for p in predictions), dtype=np.int64, count=len(predictions))
+        pred = self.vocab.intern_all([p.get("answer", "") for p in predictions])
+        return self.score_ids(question_ids, pred)
+
+    def score_ids(self, question_ids, pred):
+        rows = self.rows(question_ids)
+        answers = self.answers[rows]
+        matches = answers == pred[:, None]
+        valid = answers >= 0
+        count = matches.sum(axis=1)
+        # Official VQA accuracy: min(1, matches among the other annotators / 3),
+        # averaged over leaving out each of the annotators in turn.
+        leave_one_out = np.minimum(1.0, (count[:, None] - matches) / 3.0)
+        n_valid = valid.sum(axis=1)
+        soft = np.divide(
+            (leave_one_out * valid).sum(axis=1), n_valid, out=np.zeros(len(rows)), where=n_valid > 0
+        )
+        return Scores(question_ids, pred, rows, pred == self.mc[rows], count > 0, soft)
@@ -0,0 +1,297 @@
+# server.py
+# Agam Grewal – Capstone: Local BLIP-VQA inference server with micro-batching
+#
+#   python -m src.vqa serve [--port 8000] [--max-batch 16] [--max-wait-ms 10]
+#   python -m src.vqa ask "What color is the bus?" --image-id 9
+#
+#   POST /answer   {"question": ..., "image_id": ... | "image_path": ..., "caption": optional}
+#   GET  /health
+#   GET  /metrics
+#
+# The model is loaded once at startup, so a request only pays for image decode
+# and its share of a batched generate call. Requests that arrive within
+# max_wait_ms of the first one waiting (up to max_batch) go through the model
+# together. Uses asyncio streams and a minimal HTTP/1.1 parser, so nothing
+# beyond the standard library is needed to serve.
+
+import os
+import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from .data import IMAGE_DIR, build_baseline_text, build_caption_text
+from .image_index import load_image_index
+from .models import VQA_MODEL, default_device, load_processor
+from .backends import load_backend_model
+from .metrics import StageTimer
+
+HOST = "127.0.0.1"
+PORT = 8000
+METRICS_WINDOW = 10_000  # most recent samples kept per stage for /metrics
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+class RequestError(Exception):
+    pass
+
+
+class InferenceServer:
+    def __init__(self, processor, model, device="cpu", backend="fp32", image_dir=IMAGE_DIR, max_batch=16,
+                 max_wait_ms=10, decode_workers=4, max_new_tokens=10):
+        self.processor = processor
+        self.model = model
+        self.device = device
+        self.backend = backend
+        self.image_dir = image_dir
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_new_tokens = max_new_tokens
+        # Images decode in parallel; the model runs one batch at a time on its own thread.
+        self.decode_pool = ThreadPoolExecutor(decode_workers)
+        self.model_pool = ThreadPoolExecutor(1)
+        self.timer = StageTimer()
+        self.batch_sizes = []
+        self.started = time.time()
+        self.queue = None
+
+    # -- model side -----------------------------------------------------
+
+    def _pixels(self, request):
+        # Runs on a decode thread: returns (pixels, seconds) and leaves the timer
+        # to the event loop, which is the only thread that touches it.
+        from PIL import Image, UnidentifiedImageError
+
+        if "image_path" in request:
+            path = request["image_path"]
+        elif "image_id" in request:
+            # Refreshing is one stat of the image directory unless it changed.
+            path = load_image_index(self.image_dir).path(request["image_id"])
+            if path is None:
+                raise RequestError(f"no image {request['image_id']} in {self.image_dir}")
+        else:
+            raise RequestError("request needs an image_id or image_path")
+        start = time.perf_counter()
+        try:
+            image = Image.open(path).convert("RGB")
+        except FileNotFoundError:
+            raise RequestError(f"no image at {path}")
+        except UnidentifiedImageError:
+            raise RequestError(f"cannot decode image {path}")
+        pixels = self.processor.image_processor(image, return_tensors="np")["pixel_values"][0]
+        return pixels, time.perf_counter() - start
+
+    def _answer(self, batch, timer):
+        # batch: [(pixels, prompt)]; runs on the model thread with its own timer.
+        from .engine import answer_image_groups, stack_pixels
+
+        pixel_values = stack_pixels([pixels for pixels, _ in batch], self.device)
+        return answer_image_groups(
+            self.model, self.processor, pixel_values, [[prompt] for _, prompt in batch], self.device,
+            max_new_tokens=self.max_new_tokens, backend=self.backend, timer=timer,
+        )
+
+    async def _run(self, items):
+        timer = StageTimer()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.model_pool, self._answer, items, timer)
+        finally:
+            self.timer.merge(timer)
+
+    async def _batcher(self):
+        # Waits for a first request, then collects more until max_batch or the
+        # max_wait deadline, whichever comes first.
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            now = time.perf_counter()
+            for _, _, queued in batch:
+                self.timer.add("queue_wait", now - queued)
+            self.batch_sizes.append(len(batch))
+            try:
+                with self.timer.stage("batch"):
+                    answers = await self._run([item for item, _, _ in batch])
+            except Exception as e:
+                if len(batch) == 1:
+                    self._settle(batch[0][1], exception=e)
+                else:
+                    # Retry one at a time, so only the request that broke the batch fails.
+                    self.timer.count("batch_retries", 1)
+                    for item, future, _ in batch:
+                        try:
+                            [answer] = await self._run([item])
+                        except Exception as error:
+                            self._settle(future, exception=error)
+                        else:
+                            self._settle(future, answer)
+            else:
+                for (_, future, _), answer in zip(batch, answers):
+                    self._settle(future, answer)
+            self._trim()
+
+    @staticmethod
+    def _settle(future, answer=None, exception=None):
+        if future.done():
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(answer)
+
+    def _trim(self):
+        for samples in self.timer.samples.values():
+            del samples[:-METRICS_WINDOW]
+        del self.batch_sizes[:-METRICS_WINDOW]
+
+    # -- HTTP side ------------------------------------------------------
+
+    @staticmethod
+    def _validate(request):
+        # Everything checked here, so a malformed request never reaches a batch.
+        if not isinstance(request.get("question"), str) or not request["question"].strip():
+            raise RequestError("question must be a non-empty string")
+        if request.get("caption") is not None and not isinstance(request["caption"], str):
+            raise RequestError("caption must be a string")
+        if "image_id" in request and type(request["image_id"]) is not int:
+            raise RequestError("image_id must be an integer")
+        if "image_path" in request and not isinstance(request["image_path"], str):
+            raise RequestError("image_path must be a string")
+
+    async def answer(self, request):
+        self._validate(request)
+        item = {"question": request["question"], "caption": request.get("caption")}
+        prompt = build_caption_text(item) if item["caption"] else build_baseline_text(item)
+        loop = asyncio.get_running_loop()
+        pixels, seconds = await loop.run_in_executor(self.decode_pool, self._pixels, request)
+        self.timer.add("decode_image", seconds)
+        future = loop.create_future()
+        await self.queue.put(((pixels, prompt), future, time.perf_counter()))
+        return await future
+
+    def metrics(self):
+        sizes = self.batch_sizes
+        return {
+            "uptime_sec": round(time.time() - self.started, 1),
+            "requests": self.timer.counters.get("requests", 0),
+            "errors": self.timer.counters.get("errors", 0),
+            "queued": self.queue.qsize(),
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "mean_batch_size": round(sum(sizes) / len(sizes), 3) if sizes else 0,
+            "stages": self.timer.summary(),
+        }
+
+    async def route(self, method, path, body):
+        if path == "/health":
+            return 200, {"status": "ok", "backend": self.backend, "device": self.device}
+        if path == "/metrics":
+            return 200, self.metrics()
+        if path != "/answer":
+            return 404, {"error": f"unknown path {path}"}
+        if method != "POST":
+            return 405, {"error": "use POST"}
+
+        start = time.perf_counter()
+        self.timer.count("requests", 1)
+        try:
+            request = json.loads(body or b"{}")
+            if not isinstance(request, dict):
+                raise RequestError("request body must be a JSON object")
+            answer = await self.answer(request)
+        except (RequestError, ValueError, TypeError) as e:
+            self.timer.count("errors", 1)
+            return 400, {"error": str(e)}
+        except Exception as e:
+            self.timer.count("errors", 1)
+            return 500, {"error": str(e)}
+        elapsed = time.perf_counter() - start
+        self.timer.add("request", elapsed)
+        return 200, {"answer": answer, "latency_ms": round(elapsed * 1000, 3)}
+
+    async def _handle(self, reader, writer):
+        # One connection; keep-alive until the client closes or asks to.
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, payload = await self.route(method, target.split("?", 1)[0], body)
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve_forever(self, host=HOST, port=PORT, ready=None):
+        # ready: optional callback(port) once listening, e.g. for tests on port 0.
+        self.queue = asyncio.Queue()
+        batcher = asyncio.create_task(self._batcher())
+        server = await asyncio.start_server(self._handle, host, port)
+        port = server.sockets[0].getsockname()[1]
+        print(f"Serving BLIP-VQA on http://{host}:{port} (max batch {self.max_batch}, "
+              f"max wait {self.max_wait * 1000:g} ms)")
+        if ready is not None:
+            ready(port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self.decode_pool.shutdown(wait=False)
+            self.model_pool.shutdown(wait=False)
+
+
+def serve(model_name=VQA_MODEL, host=HOST, port=PORT, device=None, backend="fp32", image_dir=IMAGE_DIR,
+          max_batch=16, max_wait_ms=10, decode_workers=4):
+    device = device or ("cpu" if backend == "onnx" else default_device())
+    processor = load_processor(model_name)
+    model = load_backend_model(model_name, backend, device)
+    server = InferenceServer(processor, model, device, backend, image_dir, max_batch, max_wait_ms, decode_workers)
+    try:
+        asyncio.run(server.serve_forever(host, port))
+    except KeyboardInterrupt:
+        pass
+
+
+def ask(question, image_id=None, image_path=None, caption=None, url=f"http://{HOST}:{PORT}", timeout=60):
+    # Minimal client for the server above; returns the decoded JSON response.
+    import urllib.request
+    import urllib.error
+
+    request = {"question": question}
+    if image_id is not None:
+        request["image_id"] = image_id
+    if image_path is not None:
+        request["image_path"] = os.path.abspath(image_path)
+    if caption:
+        request["caption"] = caption
+    req = urllib.request.Request(
+        f"{url}/answer", data=json.dumps(request).encode(), headers={"Content-Type": "application/json"}
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        return json.load(e)
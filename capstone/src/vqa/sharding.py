@@ -0,0 +1,85 @@
+# sharding.py
+# Agam Grewal – Capstone: Multi-process sharded inference with deterministic merge
+
+import os
+import glob
+import heapq
+import multiprocessing as mp
+
+from .data import group_by_image
+from .checkpoint import PredictionWriter, iter_predictions, load_done_ids
+
+
+def shard_items(items, num_shards):
+    # Whole image groups go to the shard with the fewest questions so far,
+    # so each image is still encoded exactly once.
+    shards = [[] for _ in range(num_shards)]
+    loads = [0] * num_shards
+    for _, group in group_by_image(items):
+        i = loads.index(min(loads))
+        shards[i].extend(group)
+        loads[i] += len(group)
+    return shards
+
+
+def shard_path(checkpoint_path, shard_id):
+    root, ext = os.path.splitext(checkpoint_path)
+    return f"{root}.shard{shard_id}{ext}"
+
+
+def existing_shard_paths(checkpoint_path):
+    # Shard files left by any earlier sharded run, whatever its shard count.
+    root, ext = os.path.splitext(checkpoint_path)
+    return sorted(glob.glob(f"{glob.escape(root)}.shard*{ext}"))
+
+
+def merge_shards(shard_paths, items, checkpoint_path):
+    # k-way merge back into the order of `items`, independent of the shard count.
+    # Each shard is sorted first, since token-budget scheduling writes out of order.
+    # Question ids no longer in `items` are dropped, and a question found in
+    # several inputs is written once.
+    position = {item["question_id"]: i for i, item in enumerate(items)}
+    streams = [
+        sorted(((position[r["question_id"]], r) for r in iter_predictions(path) if r["question_id"] in position),
+               key=lambda pair: pair[0])
+        for path in shard_paths
+    ]
+    written = set()
+    with PredictionWriter(checkpoint_path, resume=False) as writer:
+        for _, record in heapq.merge(*streams, key=lambda pair: pair[0]):
+            if record["question_id"] not in written:
+                written.add(record["question_id"])
+                writer.write(record)
+
+
+def _init_shard_worker(num_threads):
+    import torch
+    torch.set_num_threads(num_threads)
+
+
+def run_sharded(run_shard, items, checkpoint_path, num_shards, threads_per_shard=None, resume=True):
+    # run_shard(items, shard_checkpoint_path) must be picklable (a module-level
+    # function or a partial of one) and load its own model; its return values are
+    # returned in shard order. Workers are forked, so the parent should not have
+    # run any torch ops yet. The merged predictions end up in checkpoint_path.
+    # On resume, questions already in the main checkpoint or in any shard file
+    # (from a single-process run or another shard count) are not sharded again.
+    previous = existing_shard_paths(checkpoint_path)
+    if resume:
+        done = set().union(*(load_done_ids(path) for path in [checkpoint_path] + previous))
+        if done:
+            print(f"Resuming: {len(done)} predictions already in {checkpoint_path} and its shard files")
+        todo = [item for item in items if item["question_id"] not in done]
+    else:
+        for path in previous:
+            os.remove(path)
+        previous, todo = [], items
+    threads = threads_per_shard or max(1, (os.cpu_count() or 1) // num_shards)
+    shards = shard_items(todo, num_shards)
+    paths = [shard_path(checkpoint_path, i) for i in range(num_shards)]
+    print(f"Running {num_shards} shards with {threads} torch threads each")
+    with mp.get_context("fork").Pool(num_shards, initializer=_init_shard_worker, initargs=(threads,)) as pool:
+        results = pool.starmap(run_shard, zip(shards, paths))
+    sources = ([checkpoint_path] if resume else []) + sorted(set(previous) | set(paths))
+    merge_shards(sources, items, checkpoint_path)
+    return results
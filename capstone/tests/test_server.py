@@ -0,0 +1,86 @@
+# test_server.py
+# Agam Grewal – Capstone: Micro-batching and error handling of the inference server
+#
+# The model side is replaced by a fake that echoes the prompts and fails on any
+# question containing "boom", so these run without a checkpoint.
+#
+#   cd capstone && python -m pytest -q tests
+
+import json
+import asyncio
+
+import pytest
+
+from src.vqa.server import InferenceServer, RequestError
+
+
+class FakeServer(InferenceServer):
+    def __init__(self, **kwargs):
+        super().__init__(processor=None, model=None, max_wait_ms=200, **kwargs)
+        self.calls = []
+
+    def _pixels(self, request):
+        return request.get("image_id"), 0.0
+
+    def _answer(self, batch, timer):
+        self.calls.append(len(batch))
+        prompts = [prompt for _, prompt in batch]
+        if any("boom" in prompt for prompt in prompts):
+            raise ValueError("tokenizer failed")
+        return [prompt.upper() for prompt in prompts]
+
+
+def serve(server, *bodies):
+    # Posts every body to /answer at once; returns [(status, payload)].
+    async def main():
+        server.queue = asyncio.Queue()
+        batcher = asyncio.create_task(server._batcher())
+        try:
+            return await asyncio.gather(*(server.route("POST", "/answer", json.dumps(b).encode()) for b in bodies))
+        finally:
+            batcher.cancel()
+
+    return asyncio.run(main())
+
+
+def test_concurrent_requests_share_a_batch():
+    server = FakeServer()
+    responses = serve(server, *({"question": f"q{i}", "image_id": i} for i in range(3)))
+    assert [status for status, _ in responses] == [200, 200, 200]
+    assert [payload["answer"] for _, payload in responses] == [f"Q{i}" for i in range(3)]
+    assert server.batch_sizes == [3]
+    assert server.metrics()["stages"]["decode_image"]["count"] == 3
+
+
+def test_failing_request_does_not_fail_its_batch():
+    server = FakeServer()
+    responses = serve(server, {"question": "ok 1", "image_id": 1}, {"question": "boom", "image_id": 2},
+                      {"question": "ok 2", "image_id": 3})
+    assert [status for status, _ in responses] == [200, 400, 200]
+    assert responses[1][1]["error"] == "tokenizer failed"
+    assert server.calls == [3, 1, 1, 1]
+    assert server.timer.counters["batch_retries"] == 1
+
+
+@pytest.mark.parametrize("body", [
+    {"question": ["a", 3], "image_id": 1},
+    {"question": "  ", "image_id": 1},
+    {"question": "q", "caption": 5, "image_id": 1},
+    {"question": "q", "image_id": "9"},
+    {"question": "q", "image_id": True},
+    {"question": "q", "image_path": 7},
+    ["not", "an", "object"],
+])
+def test_malformed_requests_are_rejected_before_batching(body):
+    server = FakeServer()
+    [(status, payload)] = serve(server, body)
+    assert status == 400 and payload["error"]
+    assert server.batch_sizes == [] and server.calls == []
+
+
+def test_undecodable_image_is_a_request_error(tmp_path):
+    path = tmp_path / "broken.jpg"
+    path.write_bytes(b"not a jpeg")
+    server = InferenceServer(processor=None, model=None)
+    with pytest.raises(RequestError, match="cannot decode"):
+        server._pixels({"image_path": str(path)})